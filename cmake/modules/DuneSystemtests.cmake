@@ -174,11 +174,10 @@ function(add_static_variants)
 
   # get the static information from the ini file
   # TODO maybe check whether an absolute path has been given for a mini file
-  dune_execute_process(COMMAND ${CMAKE_BINARY_DIR}/run-in-dune-env dune_extract_static.py
-                               --ini ${STATVAR_INIFILE}
-                               --file ${CMAKE_CURRENT_BINARY_DIR}/interface.log
-                       WORKING_DIRECTORY ${CMAKE_CURRENT_BINARY_DIR}
-                       ERROR_MESSAGE "Error extracting static info from ${STATVAR_INIFILE}")
+  dune_testtools_execute_script(SCRIPT dune_extract_static.py
+                                INIFILE ${STATVAR_INIFILE}
+                                FILE ${CMAKE_CURRENT_BINARY_DIR}/interface.log
+                                ERROR_MESSAGE "Error extracting static info from ${STATVAR_INIFILE}")
   parse_python_data(PREFIX STATINFO FILE ${CMAKE_CURRENT_BINARY_DIR}/interface.log)
 
   # If there is more than one configuration, introduce a meta target
@@ -432,10 +431,10 @@ function(dune_add_system_test)
                                  TARGETBASENAME ${SYSTEMTEST_BASENAME})
     endif()
   else()
-    dune_execute_process(COMMAND ${CMAKE_BINARY_DIR}/run-in-dune-env dune_has_static_section.py
-                                 --ini ${SYSTEMTEST_INIFILE}
-                         RESULT_VARIABLE res
-                         ERROR_MESSAGE "Error checking for static info in ${SYSTEMTEST_INIFILE}")
+    dune_testtools_execute_script(SCRIPT dune_has_static_section.py
+                                  INIFILE ${SYSTEMTEST_INIFILE}
+                                  RESULT_VARIABLE res
+                                  ERROR_MESSAGE "Error checking for static info in ${SYSTEMTEST_INIFILE}")
     if(${res})
       message(STATUS "The meta ini file specifies static variations!")
       message(FATAL_ERROR "The TARGET signature can be only used for dynamic variations.")
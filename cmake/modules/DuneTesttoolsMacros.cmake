@@ -13,6 +13,16 @@
 #    have verbose output. This is mainly useful if you are developing
 #    and debugging dune-testtools.
 #
+# .. cmake_variable:: DUNE_TESTTOOLS_METAINI_CACHE_DIR
+#
+#    The directory in which parsed meta ini files are cached between
+#    the invocations of the dune-testtools scripts during configuration.
+#    Defaults to :code:`${CMAKE_BINARY_DIR}/metaini-cache`. Set it to
+#    an empty string to disable the cache.
+#
+#    See :code:`DUNE_TESTTOOLS_BATCH_EXPANSION` for processing all meta ini
+#    files of a project in a single Python process.
+#
 
 # Generate a string containing "DEBUG" if we want to debug macros
 if(DEBUG_MACRO_TESTS)
@@ -21,7 +31,18 @@ else()
   set(DEBUG_MACRO_TESTS)
 endif()
 
+# Generate the command line arguments for the meta ini parse cache
+if(NOT DEFINED DUNE_TESTTOOLS_METAINI_CACHE_DIR)
+  set(DUNE_TESTTOOLS_METAINI_CACHE_DIR ${CMAKE_BINARY_DIR}/metaini-cache)
+endif()
+if(DUNE_TESTTOOLS_METAINI_CACHE_DIR)
+  set(DUNE_TESTTOOLS_METAINI_CACHE_ARGS --cache-dir ${DUNE_TESTTOOLS_METAINI_CACHE_DIR})
+else()
+  set(DUNE_TESTTOOLS_METAINI_CACHE_ARGS)
+endif()
+
 include(DuneCMakeAssertion)
 include(ParsePythonData)
+include(MetaIniBatch)
 include(DuneSystemtests)
 include(ExpandMetaIni)
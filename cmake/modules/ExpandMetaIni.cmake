@@ -77,12 +77,15 @@ function(dune_expand_metaini_nostatic)
   configure_file(${EXPAND_INIFILE} ${CMAKE_CURRENT_BINARY_DIR}/${BOGUSFILE})
 
   # expand the given meta ini file into the build tree
-  dune_execute_process(COMMAND ${CMAKE_BINARY_DIR}/run-in-dune-env dune_expand_metaini.py
-                               --cmake
-                               --ini ${EXPAND_INIFILE}
-                               --dir ${CMAKE_CURRENT_BINARY_DIR}
-                               --file ${CMAKE_CURRENT_BINARY_DIR}/interface.log
-                       ERROR_MESSAGE "Error expanding ${EXPAND_INIFILE}")
+  dune_testtools_execute_script(SCRIPT dune_expand_metaini.py
+                                INIFILE ${EXPAND_INIFILE}
+                                ARGS --cmake --dir ${CMAKE_CURRENT_BINARY_DIR}
+                                FILE ${CMAKE_CURRENT_BINARY_DIR}/interface.log
+                                ERROR_MESSAGE "Error expanding ${EXPAND_INIFILE}")
+
+  # Retrigger configuration on changes of any file included by the meta ini file
+  parse_python_data(PREFIX EXPANDINFO FILE ${CMAKE_CURRENT_BINARY_DIR}/interface.log)
+  set_property(DIRECTORY APPEND PROPERTY CMAKE_CONFIGURE_DEPENDS ${EXPANDINFO_includes})
 endfunction()
 
 function(dune_expand_metaini)
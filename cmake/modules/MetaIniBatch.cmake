@@ -0,0 +1,191 @@
+# Run the Python scripts of dune-testtools for all meta ini files of
+# a project within a single Python process.
+#
+# .. cmake_variable:: DUNE_TESTTOOLS_BATCH_EXPANSION
+#
+#    If turned on, the meta ini files of the project are processed by a
+#    single Python process, when the first system test is added. This
+#    avoids starting a Python interpreter for every call to the scripts
+#    :code:`dune_has_static_section.py`, :code:`dune_extract_static.py`
+#    and :code:`dune_expand_metaini.py`, which dominates the configure
+#    time of projects with many system tests. The meta ini files are
+#    expanded into the build directory corresponding to their source
+#    directory. Meta ini files used from other directories and files
+#    that fail to process are handled by calling the scripts as usual.
+#    Defaults to off.
+#
+# .. cmake_variable:: DUNE_TESTTOOLS_BATCH_INIFILES
+#
+#    The list of meta ini files to process if :code:`DUNE_TESTTOOLS_BATCH_EXPANSION`
+#    is turned on. Defaults to the meta ini files passed to :code:`dune_add_system_test`
+#    and :code:`dune_expand_metaini` during the previous configuration of the
+#    build directory. The first configuration therefore calls the scripts as usual.
+#
+# .. cmake_function:: dune_testtools_execute_script
+#
+#    .. cmake_param:: SCRIPT
+#       :single:
+#       :required:
+#
+#       The name of the script to run.
+#
+#    .. cmake_param:: INIFILE
+#       :single:
+#       :required:
+#
+#       The absolute path of the meta ini file to pass to the script.
+#
+#    .. cmake_param:: FILE
+#       :single:
+#
+#       The file the script writes its data for CMake into.
+#
+#    .. cmake_param:: ARGS
+#       :multi:
+#
+#       Further arguments to the script.
+#
+#    .. cmake_param:: RESULT_VARIABLE
+#       :single:
+#
+#       The variable to store the exit status of the script in.
+#
+#    .. cmake_param:: ERROR_MESSAGE
+#       :single:
+#
+#       The message to issue if the script fails.
+#
+#    Run one of the Python scripts of dune-testtools on a meta ini file or
+#    take its results from the batch processing, see :code:`DUNE_TESTTOOLS_BATCH_EXPANSION`.
+#
+#    .. note::
+#       This is intended for internal use only.
+#
+
+option(DUNE_TESTTOOLS_BATCH_EXPANSION "Process all meta ini files of the project in a single Python process" OFF)
+
+# The directory that holds the manifest and the results of the batch processing
+set(DUNE_TESTTOOLS_BATCH_DIR ${CMAKE_BINARY_DIR}/metaini-batch)
+
+# The file listing the meta ini files used during the last configuration
+set(DUNE_TESTTOOLS_BATCH_LIST ${CMAKE_BINARY_DIR}/metaini-batch.list)
+
+# The batch directory holding the results for a meta ini file and
+# the build directory the meta ini file is expanded into
+function(_dune_testtools_batch_paths inifile resultdir bindir)
+  file(RELATIVE_PATH rel ${CMAKE_SOURCE_DIR} ${inifile})
+  get_filename_component(reldir ${rel} DIRECTORY)
+  set(${resultdir} ${DUNE_TESTTOOLS_BATCH_DIR}/${rel} PARENT_SCOPE)
+  if(reldir)
+    set(${bindir} ${CMAKE_BINARY_DIR}/${reldir} PARENT_SCOPE)
+  else()
+    set(${bindir} ${CMAKE_BINARY_DIR} PARENT_SCOPE)
+  endif()
+endfunction()
+
+# Process all meta ini files of the project, unless that has already happened
+function(_dune_testtools_run_batch)
+  get_property(done GLOBAL PROPERTY DUNE_TESTTOOLS_BATCH_DONE)
+  if(done)
+    return()
+  endif()
+  set_property(GLOBAL PROPERTY DUNE_TESTTOOLS_BATCH_DONE TRUE)
+
+  if(DEFINED DUNE_TESTTOOLS_BATCH_INIFILES)
+    set(inifiles ${DUNE_TESTTOOLS_BATCH_INIFILES})
+  elseif(EXISTS ${DUNE_TESTTOOLS_BATCH_LIST})
+    file(STRINGS ${DUNE_TESTTOOLS_BATCH_LIST} inifiles)
+  else()
+    set(inifiles "")
+  endif()
+  # The meta ini files of this configuration are recorded for the next one
+  file(WRITE ${DUNE_TESTTOOLS_BATCH_LIST} "")
+
+  set(cacheargs "")
+  if(DUNE_TESTTOOLS_METAINI_CACHE_DIR)
+    set(cacheargs "--cache-dir \"${DUNE_TESTTOOLS_METAINI_CACHE_DIR}\"")
+  endif()
+
+  # Write one line per script call into the manifest
+  set(manifest "")
+  foreach(inifile ${inifiles})
+    if(NOT IS_ABSOLUTE ${inifile})
+      set(inifile ${CMAKE_SOURCE_DIR}/${inifile})
+    endif()
+    # Skip meta ini files within the build directory
+    string(FIND "${inifile}" "${CMAKE_BINARY_DIR}/" pos)
+    if(pos EQUAL 0)
+      continue()
+    endif()
+    _dune_testtools_batch_paths(${inifile} resultdir bindir)
+    string(APPEND manifest "\"${resultdir}/dune_has_static_section.py.status\" dune_has_static_section.py --ini \"${inifile}\" ${cacheargs}\n")
+    string(APPEND manifest "\"${resultdir}/dune_extract_static.py.status\" dune_extract_static.py --ini \"${inifile}\" --file \"${resultdir}/dune_extract_static.py.log\" ${cacheargs}\n")
+    string(APPEND manifest "\"${resultdir}/dune_expand_metaini.py.status\" dune_expand_metaini.py --cmake --ini \"${inifile}\" --dir \"${bindir}\" --file \"${resultdir}/dune_expand_metaini.py.log\" ${cacheargs}\n")
+  endforeach()
+
+  file(REMOVE_RECURSE ${DUNE_TESTTOOLS_BATCH_DIR})
+  if(manifest STREQUAL "")
+    return()
+  endif()
+  file(WRITE ${DUNE_TESTTOOLS_BATCH_DIR}/manifest "${manifest}")
+  dune_execute_process(COMMAND ${CMAKE_BINARY_DIR}/run-in-dune-env dune_expand_batch.py
+                               --manifest ${DUNE_TESTTOOLS_BATCH_DIR}/manifest
+                       ERROR_MESSAGE "Error processing the meta ini files in a batch")
+endfunction()
+
+function(dune_testtools_execute_script)
+  set(OPTION "")
+  set(SINGLE SCRIPT INIFILE FILE RESULT_VARIABLE ERROR_MESSAGE)
+  set(MULTI ARGS)
+  cmake_parse_arguments(EXEC "${OPTION}" "${SINGLE}" "${MULTI}" ${ARGN})
+
+  # Look up the result of the batch processing. Meta ini files are only
+  # expanded in batch into the build directory corresponding to their source.
+  set(status "")
+  if(DUNE_TESTTOOLS_BATCH_EXPANSION)
+    _dune_testtools_run_batch()
+    get_property(recorded GLOBAL PROPERTY DUNE_TESTTOOLS_BATCH_RECORDED)
+    if(NOT EXEC_INIFILE IN_LIST recorded)
+      set_property(GLOBAL APPEND PROPERTY DUNE_TESTTOOLS_BATCH_RECORDED ${EXEC_INIFILE})
+      file(APPEND ${DUNE_TESTTOOLS_BATCH_LIST} "${EXEC_INIFILE}\n")
+    endif()
+    _dune_testtools_batch_paths(${EXEC_INIFILE} resultdir bindir)
+    if(EXISTS ${resultdir}/${EXEC_SCRIPT}.status AND
+       (NOT EXEC_SCRIPT STREQUAL "dune_expand_metaini.py" OR bindir STREQUAL CMAKE_CURRENT_BINARY_DIR))
+      file(READ ${resultdir}/${EXEC_SCRIPT}.status status)
+      if(NOT status MATCHES "^[01]$")
+        set(status "")
+      endif()
+    endif()
+  endif()
+
+  if(NOT "${status}" STREQUAL "")
+    if(EXEC_FILE)
+      configure_file(${resultdir}/${EXEC_SCRIPT}.log ${EXEC_FILE} COPYONLY)
+    endif()
+    if(EXEC_RESULT_VARIABLE)
+      set(${EXEC_RESULT_VARIABLE} ${status} PARENT_SCOPE)
+    endif()
+    return()
+  endif()
+
+  set(fileargs "")
+  if(EXEC_FILE)
+    set(fileargs --file ${EXEC_FILE})
+  endif()
+  set(resultargs "")
+  if(EXEC_RESULT_VARIABLE)
+    set(resultargs RESULT_VARIABLE res)
+  endif()
+  dune_execute_process(COMMAND ${CMAKE_BINARY_DIR}/run-in-dune-env ${EXEC_SCRIPT}
+                               ${EXEC_ARGS}
+                               --ini ${EXEC_INIFILE}
+                               ${fileargs}
+                               ${DUNE_TESTTOOLS_METAINI_CACHE_ARGS}
+                       WORKING_DIRECTORY ${CMAKE_CURRENT_BINARY_DIR}
+                       ${resultargs}
+                       ERROR_MESSAGE "${EXEC_ERROR_MESSAGE}")
+  if(EXEC_RESULT_VARIABLE)
+    set(${EXEC_RESULT_VARIABLE} ${res} PARENT_SCOPE)
+  endif()
+endfunction()
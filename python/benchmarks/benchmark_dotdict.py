@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+Micro-benchmarks for the DotDict class, covering the access patterns of
+:code:`expand_meta_ini`: Filling a dictionary from the parser, item access
+and membership tests with dotted keys, :code:`len`, iteration, copying,
+filtering, hashing and sorting of configurations.
+
+Usage:
+
+.. code-block:: shell
+
+    python benchmarks/benchmark_dotdict.py --sections 10 --keys 20
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.parametertree.dotdict import DotDict
+    from copy import deepcopy
+    import argparse
+    import timeit
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sections', type=int, default=10, help='The number of sections per dictionary')
+    parser.add_argument('--keys', type=int, default=20, help='The number of keys per section')
+    parser.add_argument('--configs', type=int, default=200, help='The number of configurations to hash and sort')
+    parser.add_argument('--repeat', type=int, default=5, help='How often to repeat each measurement')
+    args = vars(parser.parse_args())
+
+    keys = ["section{}.sub.key{}".format(s, k) for s in range(args['sections']) for k in range(args['keys'])]
+
+    def fill():
+        d = DotDict()
+        for k in keys:
+            d[k] = "value"
+        return d
+
+    d = fill()
+    configs = []
+    for i in range(args['configs']):
+        c = d.copy()
+        c[keys[i % len(keys)]] = str(i)
+        configs.append(c)
+
+    def getitem():
+        for k in keys:
+            d[k]
+
+    def contains():
+        for k in keys:
+            k in d
+            "missing." + k in d
+
+    def length():
+        for i in range(100):
+            len(d)
+
+    def iterate():
+        for k in d:
+            pass
+        d.items()
+
+    def section():
+        for s in range(args['sections']):
+            d["section{}".format(s)]
+
+    benchmarks = (("fill", fill),
+                  ("getitem", getitem),
+                  ("contains", contains),
+                  ("len (x100)", length),
+                  ("iterate", iterate),
+                  ("section", section),
+                  ("deepcopy", lambda: deepcopy(d)),
+                  ("filter", lambda: d.filter(["section0", "section1"])),
+                  ("hash+sort", lambda: sorted(set(configs))),
+                  )
+
+    print("DotDict with {} keys, {} configurations".format(len(keys), len(configs)))
+    for name, func in benchmarks:
+        t = min(timeit.repeat(func, number=10, repeat=args['repeat'])) / 10
+        print("  {:<12} {:10.1f} us".format(name, t * 1e6))
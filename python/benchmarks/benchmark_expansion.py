@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+Measure the expansion of a meta ini file into the product of the value
+lists of its expanded keys.
+
+Usage:
+
+.. code-block:: shell
+
+    python benchmarks/benchmark_expansion.py --factors 5 5 4 3 --keys 200
+
+With :code:`--scaling`, the first factor is doubled repeatedly and the time
+per configuration is reported, which should stay roughly constant.
+
+With :code:`--constrained`, all configurations in which the first two expanded
+keys differ are excluded, e.g. 90% of them for :code:`--factors 10 10 4 3`.
+
+With :code:`--jobs`, the configurations are resolved by the given number of
+processes (see :func:`dune.testtools.metaini.expand_meta_ini`).
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.metaini import expand_meta_ini
+    from synthetic import generate_product_meta_ini, write_meta_ini
+    import argparse
+    import shutil
+    import tempfile
+    import timeit
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--factors', type=int, nargs='+', default=[5, 5, 4, 3], help='The number of values of each expanded key')
+    parser.add_argument('--keys', type=int, default=200, help='The number of plain keys')
+    parser.add_argument('--repeat', type=int, default=3, help='How often to repeat each measurement')
+    parser.add_argument('--scaling', type=int, default=0, help='The number of times to double the first factor')
+    parser.add_argument('--constrained', action="store_true", help='Exclude all configurations in which the first two expanded keys differ')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='The number of processes to resolve the configurations with')
+    args = vars(parser.parse_args())
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for i in range(args['scaling'] + 1):
+            factors = [args['factors'][0] * 2 ** i] + args['factors'][1:]
+            filename = write_meta_ini(tmpdir, generate_product_meta_ini(factors=factors, keys=args['keys'], constrained=args['constrained']))
+            configs = expand_meta_ini(filename, jobs=args['jobs'])
+            t = min(timeit.repeat(lambda: expand_meta_ini(filename, jobs=args['jobs']), number=1, repeat=args['repeat']))
+            print("Expanding {} keys with factors {} into {} configurations: {:.3f} s ({:.1f} us per configuration)".format(args['keys'], factors, len(configs), t, t / len(configs) * 1e6))
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+"""
+Compare parsing a large plain Dune ini file (as written by an OutputTree) with
+the grammar to parsing it with the regular expression fast path.
+
+Usage:
+
+.. code-block:: shell
+
+    python benchmarks/benchmark_outputtree.py --timesteps 500 --keys 40
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.parametertree.parser import parse_ini_file
+    from synthetic import generate_output_tree, write_meta_ini
+    import argparse
+    import shutil
+    import tempfile
+    import timeit
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--timesteps', type=int, default=500, help='The number of sections in the synthetic file')
+    parser.add_argument('--keys', type=int, default=40, help='The number of keys per section')
+    parser.add_argument('--repeat', type=int, default=3, help='How often to repeat each measurement')
+    args = vars(parser.parse_args())
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        lines = generate_output_tree(timesteps=args['timesteps'], keys=args['keys'])
+        filename = write_meta_ini(tmpdir, lines, name="synthetic.out")
+
+        print("Parsing an output tree with {} lines".format(len(lines)))
+        for mode, fastpath in (("grammar", False), ("fastpath", True)):
+            t = min(timeit.repeat(lambda: parse_ini_file(filename, fastpath=fastpath), number=1, repeat=args['repeat']))
+            print("  {:<10} {:8.3f} s".format(mode, t))
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+"""
+Compare parsing meta ini files with and without the regular expression fast
+path for plain lines.
+
+Usage:
+
+.. code-block:: shell
+
+    python benchmarks/benchmark_parser.py --sections 100 --keys 30
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.parser import parse_ini_file
+    from synthetic import generate_meta_ini, write_meta_ini
+    import argparse
+    import shutil
+    import tempfile
+    import timeit
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sections', type=int, default=100, help='The number of sections in the synthetic file')
+    parser.add_argument('--keys', type=int, default=30, help='The number of keys per section')
+    parser.add_argument('--includes', type=int, default=4, help='The number of included files')
+    parser.add_argument('--repeat', type=int, default=3, help='How often to repeat each measurement')
+    args = vars(parser.parse_args())
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for i in range(args['includes']):
+            write_meta_ini(tmpdir, generate_meta_ini(sections=2, keys=args['keys']), name="include{}.mini".format(i))
+        lines = generate_meta_ini(sections=args['sections'], keys=args['keys'], expand_every=5, includes=args['includes'])
+        filename = write_meta_ini(tmpdir, lines)
+
+        print("Parsing a meta ini file with {} lines (and {} includes)".format(len(lines), args['includes']))
+        for mode, fastpath in (("grammar", False), ("grammar+fastpath", True)):
+            t = min(timeit.repeat(lambda: parse_ini_file(filename, returnCommands=True, fastpath=fastpath), number=1, repeat=args['repeat']))
+            print("  {:<22} {:8.3f} s".format(mode, t))
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""
+Measure the whole meta ini pipeline on a suite of synthetic parameter sweeps.
+
+Each scenario of the suite varies one property of a baseline meta ini file
+(see :func:`synthetic.generate_sweep_meta_ini`): the number of keys, the number
+of expanded groups and values per group, the depth of chains of curly bracket
+references, the number of exclude and label commands, the number of included
+files and the number of static variants. For each scenario, the time of
+
+* parsing the meta ini file (:code:`parse_ini_file`),
+* expanding it (:code:`expand_meta_ini`),
+* extracting the static information (:code:`extract_static_info`),
+* writing the ini files (:code:`write_configuration_to_ini`) and
+* passing the data to CMake (:code:`printForCMake`)
+
+is measured. The results are printed and can be written into a JSON file. Given
+the JSON file of a previous run, the ratio of the previous to the current times
+is printed as well, which tells whether a change made these paths faster:
+
+.. code-block:: shell
+
+    python benchmarks/benchmark_suite.py --output before.json
+    # change the code
+    python benchmarks/benchmark_suite.py --output after.json --compare before.json
+
+Use :code:`--scenario` to run some scenarios only and :code:`--scale` to
+multiply the number of keys and the fan-out of all scenarios.
+
+"""
+
+# The baseline sweep and the scenarios, each varying some of its parameters
+BASELINE = dict(keys=200, groups=3, values=4, depth=0, excludes=0, labels=0, static=0, includes=0)
+SCENARIOS = [("baseline", {}),
+             ("keys", dict(keys=2000)),
+             ("groups", dict(groups=5)),
+             ("values", dict(groups=2, values=30)),
+             ("depth", dict(depth=20)),
+             ("excludes", dict(excludes=12)),
+             ("labels", dict(labels=20)),
+             ("includes", dict(includes=50)),
+             ("static", dict(static=8)),
+             ]
+
+# The parameters multiplied by --scale
+SCALED = ("keys", "depth", "excludes", "labels", "includes")
+
+if __name__ == "__main__":
+
+    from dune.testtools.cmakeoutput import printForCMake
+    from dune.testtools.metaini import expand_meta_ini, write_configuration_to_ini
+    from dune.testtools.parser import parse_ini_file
+    from dune.testtools.static_metaini import extract_static_info
+    from synthetic import write_sweep_meta_ini
+    from copy import deepcopy
+    import argparse
+    import json
+    import os
+    import platform
+    import shutil
+    import tempfile
+    import timeit
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenario', nargs='+', default=[name for name, _ in SCENARIOS], choices=[name for name, _ in SCENARIOS], help='The scenarios to run')
+    parser.add_argument('--scale', type=int, default=1, help='Multiply the number of keys and the fan-out of all scenarios')
+    parser.add_argument('--repeat', type=int, default=3, help='How often to repeat each measurement')
+    parser.add_argument('-o', '--output', default=None, help='Write the results into the given JSON file')
+    parser.add_argument('--compare', default=None, help='Compare to the results of a previous run, given as JSON file')
+    args = vars(parser.parse_args())
+
+    def measure(func, setup=None):
+        """ The minimal time of calling func, each call preceded by an untimed call to setup """
+        times = []
+        for i in range(args['repeat']):
+            data = setup() if setup else None
+            times.append(timeit.timeit(lambda: func(data) if setup else func(), number=1))
+        return min(times)
+
+    def write_all(data):
+        """ Write the ini files of the configurations like dune_expand_metaini.py does """
+        configurations, metaini, static_info, options = data
+        for c in configurations:
+            if "__LABELS" in c:
+                c["__LABELS"] = list(c["__LABELS"].values())
+                metaini["labels"][c["__name"]] = c["__LABELS"]
+            write_configuration_to_ini(c, metaini, static_info, options)
+
+    def run(params, tmpdir):
+        filename = write_sweep_meta_ini(tmpdir, **params)
+        outdir = os.path.join(tmpdir, "out")
+        os.mkdir(outdir)
+        options = {"dir": outdir, "cmake": True}
+
+        configurations = expand_meta_ini(filename)
+        static_info = extract_static_info(filename)
+        metaini = {"names": [], "labels": {}}
+        write_all((deepcopy(configurations), metaini, static_info, options))
+
+        times = {}
+        times["parse_ini_file"] = measure(lambda: parse_ini_file(filename, returnCommands=True))
+        times["expand_meta_ini"] = measure(lambda: expand_meta_ini(filename))
+        times["extract_static_info"] = measure(lambda: extract_static_info(filename))
+        times["write_configuration_to_ini"] = measure(write_all, lambda: (deepcopy(configurations), {"names": [], "labels": {}}, static_info, options))
+        times["printForCMake"] = measure(lambda: printForCMake(metaini, os.path.join(tmpdir, "cmake.txt")))
+        return {"parameters": params, "configurations": len(configurations), "seconds": times}
+
+    previous = {}
+    if args['compare']:
+        with open(args['compare']) as f:
+            previous = json.load(f)["scenarios"]
+
+    results = {}
+    for name, variation in SCENARIOS:
+        if name not in args['scenario']:
+            continue
+        params = dict(BASELINE, **variation)
+        for p in SCALED:
+            params[p] = params[p] * args['scale']
+        tmpdir = tempfile.mkdtemp()
+        try:
+            results[name] = run(params, tmpdir)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        print("{} ({} configurations):".format(name, results[name]["configurations"]))
+        for func, t in sorted(results[name]["seconds"].items()):
+            line = "  {:<28} {:8.4f} s".format(func, t)
+            if name in previous and func in previous[name]["seconds"]:
+                line = line + "  ({:.2f}x of previous)".format(previous[name]["seconds"][func] / t if t else float("inf"))
+            print(line)
+
+    if args['output']:
+        with open(args['output'], "w") as f:
+            json.dump({"python": platform.python_version(), "repeat": args['repeat'], "scale": args['scale'], "scenarios": results}, f, indent=2, sort_keys=True)
@@ -0,0 +1,167 @@
+""" Generators for synthetic meta ini files
+
+.. currentmodule:: synthetic
+
+The benchmarks in this directory do not rely on checked-in data files.
+Instead, meta ini files of a given size and shape are generated into
+a temporary directory by the functions in this module.
+"""
+from __future__ import absolute_import
+import os
+
+
+def generate_meta_ini(sections=10, keys=20, expand_every=0, comments=True, includes=0):
+    """ Generate the content of a synthetic meta ini file
+
+        :param sections: The number of sections
+        :type sections: int
+        :param keys: The number of keys per section
+        :type keys: int
+        :param expand_every: Attach an expand command to every n-th key (0 for no expansion)
+        :type expand_every: int
+        :param comments: Whether to add comment and blank lines
+        :type comments: bool
+        :param includes: The number of include statements to put at the top of the file
+        :type includes: int
+
+        :returns: The lines of the meta ini file
+        :rtype: list of strings
+    """
+    lines = ["include include{}.mini".format(i) for i in range(includes)]
+    lines.append("__name = synthetic")
+    for s in range(sections):
+        if comments:
+            lines.append("")
+            lines.append("# Section number {}".format(s))
+        lines.append("[section{}]".format(s))
+        for k in range(keys):
+            if expand_every and k % expand_every == 0:
+                lines.append("key{0} = {0}a, {0}b | expand".format(k))
+            else:
+                lines.append("key{0} = value{0} # trailing comment".format(k))
+    return lines
+
+
+def write_meta_ini(dirname, lines, name="synthetic.mini"):
+    """ Write the given lines into a meta ini file in directory `dirname` and return its path """
+    filename = os.path.join(dirname, name)
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return filename
+
+
+def generate_output_tree(timesteps=500, keys=40):
+    """ Generate the content of a synthetic Dune ini output file, as written by an OutputTree
+
+        :param timesteps: The number of sections, one per time step
+        :type timesteps: int
+        :param keys: The number of keys per section
+        :type keys: int
+
+        :returns: The lines of the ini file
+        :rtype: list of strings
+    """
+    lines = ["time = 1.0", "steps = {}".format(timesteps)]
+    for t in range(timesteps):
+        lines.append("[timestep{}]".format(t))
+        for k in range(keys):
+            lines.append("norm{} = {:.12e}".format(k, 1.0 / (t + k + 1)))
+    return lines
+
+
+def generate_product_meta_ini(factors=(5, 5, 4, 3), keys=200, sections=10, constrained=False):
+    """ Generate the content of a meta ini file expanding into a product of value lists
+
+        :param factors: The number of values of each expanded key
+        :type factors: tuple of int
+        :param keys: The total number of plain keys besides the expanded ones
+        :type keys: int
+        :param sections: The number of sections to distribute the plain keys into
+        :type sections: int
+        :param constrained: Whether to exclude all configurations, in which the values
+                            of the first two expanded keys differ
+        :type constrained: bool
+
+        :returns: The lines of the meta ini file
+        :rtype: list of strings
+    """
+    lines = ["__name = synthetic"]
+    for i, n in enumerate(factors):
+        lines.append("expanded{} = {} | expand".format(i, ", ".join("v{}".format(j) for j in range(n))))
+    if constrained:
+        lines.append("{expanded0} != {expanded1} | exclude")
+    for s in range(sections):
+        lines.append("[section{}]".format(s))
+        for k in range(keys // sections):
+            lines.append("key{0} = value{0}".format(k))
+    return lines
+
+
+def generate_sweep_meta_ini(keys=200, groups=3, values=4, depth=0, excludes=0, labels=0, static=0, includes=0):
+    """ Generate the content of a meta ini file describing a parameter sweep
+
+        :param keys: The total number of plain keys, in sections of ten keys
+        :type keys: int
+        :param groups: The number of groups of keys expanded together. Each group has two keys.
+        :type groups: int
+        :param values: The number of values of each expanded key
+        :type values: int
+        :param depth: The length of a chain of keys referencing each other through curly brackets
+        :type depth: int
+        :param excludes: The number of exclude commands, each excluding one combination of values
+                         of the first two groups. The combination of the last values is never
+                         excluded, further commands repeat the excluded combinations.
+        :type excludes: int
+        :param labels: The number of label commands, each depending on the value of the first group
+        :type labels: int
+        :param static: The number of static variants (0 for no static section)
+        :type static: int
+        :param includes: The number of include statements, see :func:`write_sweep_meta_ini`
+        :type includes: int
+
+        :returns: The lines of the meta ini file
+        :rtype: list of strings
+    """
+    lines = ["include included{}.mini".format(i) for i in range(includes)]
+    lines.append("__name = sweep")
+    if static:
+        lines.append("__exec_suffix = {__static.VARIANT}")
+    first = "{group0.a}" if groups else "x"
+
+    for n in range(depth):
+        lines.append("chain{} = {}_{}".format(n, "{{chain{}}}".format(n - 1) if n else first, n))
+    for i in range(excludes):
+        if groups > 1:
+            i = i % max(values * values - 1, 1)
+            lines.append("{{group0.a}} == {} and {{group1.a}} == {} | exclude".format(i % values, i // values))
+        else:
+            lines.append("{} == {} | exclude".format(first, i % max(values - 1, 1)))
+    for i in range(labels):
+        lines.append("{} == {} | label L{} CUSTOM{}".format(first, i % max(values, 1), i, i))
+
+    for g in range(groups):
+        lines.append("[group{}]".format(g))
+        lines.append("a = {} | expand group{}".format(", ".join(str(j) for j in range(values)), g))
+        lines.append("b = {} | expand group{}".format(", ".join("s{}".format(j) for j in range(values)), g))
+    for s in range(keys // 10):
+        lines.append("[section{}]".format(s))
+        for k in range(10):
+            lines.append("key{0} = value{0}".format(k))
+    if static:
+        lines.append("[__static]")
+        lines.append("VARIANT = {} | expand static".format(", ".join("V{}".format(j) for j in range(static))))
+    return lines
+
+
+def write_sweep_meta_ini(dirname, includes=0, **kwargs):
+    """ Write a meta ini file generated by :func:`generate_sweep_meta_ini` and the files it includes
+
+        Each included file holds a section of ten keys.
+
+        :returns: The path of the meta ini file
+        :rtype: string
+    """
+    for i in range(includes):
+        lines = ["[included{}]".format(i)] + ["key{0} = value{0}".format(k) for k in range(10)]
+        write_meta_ini(dirname, lines, name="included{}.mini".format(i))
+    return write_meta_ini(dirname, generate_sweep_meta_ini(includes=includes, **kwargs), name="sweep.mini")
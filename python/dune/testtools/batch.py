@@ -0,0 +1,194 @@
+""" Run the CMake interface scripts for many meta ini files in a single process
+
+.. currentmodule:: dune.testtools.batch
+
+During a CMake configure run, the scripts ``dune_has_static_section.py``,
+``dune_extract_static.py`` and ``dune_expand_metaini.py`` are called once or
+twice per system test. Each call starts a new Python interpreter and imports
+pyparsing, which dominates the configure time of modules with many system tests.
+
+This module implements the work of these scripts as functions. The scripts are
+thin wrappers around them and :func:`run_manifest` runs a whole list of such
+script calls within one process. A manifest holds one script call per line:
+
+.. code-block:: none
+
+    <status file> <script name> <script arguments>
+
+The line is split like a shell command line, so paths containing spaces have to
+be quoted. For each call, the exit status of the script is written into the
+status file. If the call fails, the status file holds ``error`` followed by the
+error message. The CMake macros then call the script on its own to report the
+error.
+"""
+from __future__ import absolute_import
+import argparse
+import os
+import shlex
+import traceback
+
+
+def _add_common_arguments(parser):
+    parser.add_argument('-i', '--ini', help='The meta-inifile to expand', required=True)
+    parser.add_argument('-s', '--section', default="__static", help='The section to treat as the static section (defaults to __static)')
+    parser.add_argument('--cache-dir', default=None, help='A directory to cache parsed meta ini files in')
+
+
+def expand_parser():
+    """ The argument parser of ``dune_expand_metaini.py`` """
+    parser = argparse.ArgumentParser(prog="dune_expand_metaini.py")
+    _add_common_arguments(parser)
+    parser.add_argument('-d', '--dir', help='The directory to put the output in')
+    parser.add_argument('-c', '--cmake', action="store_true", help='Set if the script is called from CMake and should return data to it')
+    parser.add_argument('-f', '--file', default=None, help='The filename to write the result into (stdout if omitted)')
+    parser.add_argument('--stream', action="store_true", help='Write the ini files while expanding instead of holding all configurations in memory')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='The number of processes to resolve the configurations with (defaults to DUNE_TESTTOOLS_JOBS or 1, 0 uses all cores)')
+    parser.add_argument('--shard', default=None, help='Only write the configurations of shard i out of N, given as i/N (defaults to DUNE_TESTTOOLS_SHARD or all configurations)')
+    parser.add_argument('--profile', action="store_true", help='Print the time spent in each phase of the expansion and on each command to stderr')
+    parser.add_argument('--profile-json', default=None, help='Export the time spent in each phase of the expansion and on each command into the given JSON file')
+    return parser
+
+
+def expand(args):
+    """ Expand a meta ini file into ini files and pass the names of these to CMake
+
+        :param args: The parsed arguments of :func:`expand_parser`
+        :type args: dict
+        :returns: The exit status
+    """
+    if args.get("profile") or args.get("profile_json"):
+        from dune.testtools.profiling import Profile
+        import sys
+        with Profile() as profile:
+            status = expand(dict(args, profile=False, profile_json=None))
+        if args["profile"]:
+            sys.stderr.write(profile.report() + "\n")
+        if args["profile_json"]:
+            profile.write_json(args["profile_json"])
+        return status
+
+    from dune.testtools.metaini import expand_meta_ini, expand_meta_ini_stream, write_configuration_to_ini
+    from dune.testtools.static_metaini import extract_static_info
+    from dune.testtools.parser import include_graph
+    from dune.testtools.profiling import timed
+
+    # a CI runner configuring through CMake selects its shard through the environment
+    shard = args["shard"] or os.environ.get("DUNE_TESTTOOLS_SHARD")
+
+    # expand the meta ini files into a list of configurations
+    if args["stream"]:
+        configurations = expand_meta_ini_stream(args["ini"], cache_dir=args["cache_dir"], shard=shard)
+    else:
+        configurations = expand_meta_ini(args["ini"], cache_dir=args["cache_dir"], jobs=args["jobs"], shard=shard)
+
+    # initialize a data structure to pass the list of generated ini files to CMake
+    metaini = {}
+    metaini["names"] = []  # TODO this should  have underscores!
+    metaini["labels"] = {}
+
+    # extract the static information from the meta ini file
+    with timed("static"):
+        static_info = extract_static_info(args["ini"], section=args['section'], cache_dir=args["cache_dir"])
+
+    # write the configurations to the file specified in the name key.
+    for c in configurations:
+        # Discard label groups from the data
+        if "__LABELS" in c:
+            c["__LABELS"] = list(c["__LABELS"].values())
+            metaini["labels"][c["__name"]] = c["__LABELS"]
+        with timed("writing"):
+            write_configuration_to_ini(c, metaini, static_info, args, section=args['section'])
+
+    # pass all included files to CMake, such that it can track them as dependencies
+    metaini["includes"] = sorted(f for f in include_graph(args["ini"], cache_dir=args["cache_dir"]) if f != os.path.normpath(args["ini"]))
+
+    if args["cmake"]:
+        from dune.testtools.cmakeoutput import printForCMake
+        printForCMake(metaini, args['file'])
+    return 0
+
+
+def extract_static_parser():
+    """ The argument parser of ``dune_extract_static.py`` """
+    parser = argparse.ArgumentParser(prog="dune_extract_static.py")
+    _add_common_arguments(parser)
+    parser.add_argument('-f', '--file', default=None, help='The filename to write the result into (stdout if omitted)')
+    return parser
+
+
+def extract_static(args):
+    """ Pass the static variations of a meta ini file to CMake
+
+        :param args: The parsed arguments of :func:`extract_static_parser`
+        :type args: dict
+        :returns: The exit status
+    """
+    from dune.testtools.static_metaini import extract_static_info
+    from dune.testtools.cmakeoutput import printForCMake
+
+    static = extract_static_info(args["ini"], args['section'], add_guards=True, cache_dir=args["cache_dir"])
+    printForCMake(static, args['file'])
+    return 0
+
+
+def has_static_section_parser():
+    """ The argument parser of ``dune_has_static_section.py`` """
+    parser = argparse.ArgumentParser(prog="dune_has_static_section.py")
+    _add_common_arguments(parser)
+    return parser
+
+
+def has_static_section(args):
+    """ Check for static variations in a meta ini file
+
+        :param args: The parsed arguments of :func:`has_static_section_parser`
+        :type args: dict
+        :returns: The exit status, 1 if there are static variations and 0 otherwise
+    """
+    from dune.testtools.metaini import expand_meta_ini
+
+    configurations = expand_meta_ini(args['ini'], whiteFilter=(args['section'],), addNameKey=False, cache_dir=args['cache_dir'])
+    if len(configurations) > 1:
+        return 1
+    return 0
+
+
+# The scripts that can be called through a manifest
+_scripts = {"dune_expand_metaini.py": (expand_parser, expand),
+            "dune_extract_static.py": (extract_static_parser, extract_static),
+            "dune_has_static_section.py": (has_static_section_parser, has_static_section),
+            }
+
+
+def run_manifest(manifest):
+    """ Run all script calls given in a manifest file
+
+        :param manifest: The name of the manifest file
+        :type manifest: string
+        :returns: The number of failed script calls
+    """
+    failed = 0
+    with open(manifest) as f:
+        for line in f:
+            call = shlex.split(line)
+            if not call:
+                continue
+            if len(call) < 2 or call[1] not in _scripts:
+                raise ValueError("Invalid line in manifest {}: {}".format(manifest, line.strip()))
+            status_file, script, argv = call[0], call[1], call[2:]
+            parser, func = _scripts[script]
+            # The data for CMake is written next to the status file
+            dirname = os.path.dirname(status_file)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            try:
+                args = vars(parser().parse_args(argv))
+                if args.get("dir") and not os.path.isdir(args["dir"]):
+                    os.makedirs(args["dir"])
+                status = str(func(args))
+            except (Exception, SystemExit):
+                status = "error\n" + traceback.format_exc()
+                failed = failed + 1
+            with open(status_file, "w") as s:
+                s.write(status)
+    return failed
@@ -21,6 +21,7 @@ to undo the replacement.
 """
 from __future__ import absolute_import
 from __future__ import print_function
+from dune.testtools.parametertree.dotdict import DotDict
 
 
 def printForCMake(d, filename):
@@ -94,6 +95,8 @@ def printForCMake(d, filename):
 
     def add_dictionary_to_keys(dic, singlekeys, multikeys, data, prefix=""):
         # add a dictionary to the keys
+        if isinstance(dic, DotDict):
+            dic = dic.nested()
         for key, value in dict.items(dic):
             if isinstance(value, dict):
                 singlekeys, multikeys, data = add_dictionary_to_keys(value, singlekeys, multikeys, data, prefix + str(key) + "_")
@@ -48,6 +48,8 @@ in your meta inifile and have it resolved to:
 
 from __future__ import absolute_import
 from dune.testtools.escapes import replace_delimited
+from dune.testtools.profiling import active_profile
+import time
 
 _registry = {}
 
@@ -79,6 +81,13 @@ class CommandType:
     AT_EXPANSION = 7
 
 
+def command_type_name(ctype):
+    """ The name of the given command type, e.g. POST_RESOLUTION """
+    for k, v in CommandType.__dict__.items():
+        if v == ctype and not k.startswith("_"):
+            return k
+
+
 def command_count():
     """ Return the total number of registered commands. """
     return max(v for v in list(CommandType.__dict__.values()) if type(v) == int) + 1
@@ -142,18 +151,38 @@ def apply_commands(configurations, cmds, all_cmds=[]):
 
     .. note::
         Application of a command might modify the list of all commands.
+        Once the list of configurations is empty, the remaining commands are skipped.
+
+    If profiling is active (see :mod:`dune.testtools.profiling`), the time spent on
+    each command is recorded by its name, its key and its command type.
     """
+    profile = active_profile()
     for cmd in cmds:
+        # A command like exclude might have removed all configurations
+        if not configurations:
+            return
         # check whether the command ist still applicable. The key could have been filtered away!
         if cmd.key in configurations[0] or cmd.name == 'expand':
-            if _registry[cmd.name]._returnConfigs:
-                configurations[:] = _registry[cmd.name](args=cmd.args, key=cmd.key, configs=configurations, commands=all_cmds)
+            if profile is None:
+                _apply_command(configurations, cmd, all_cmds)
             else:
-                for c in configurations:
-                    replargs = [replace_delimited(arg, c, leftdelimiter="{", rightdelimiter="}") for arg in cmd.args]
-                    ret = _registry[cmd.name](args=replargs, key=cmd.key, config=c, value=c[cmd.key], configs=configurations, commands=all_cmds)
-                    if _registry[cmd.name]._returnValue:
-                        c[cmd.key] = ret
+                start = time.time()
+                _apply_command(configurations, cmd, all_cmds)
+                seconds = time.time() - start
+                profile.add("commands", cmd.name, seconds)
+                profile.add("keys", str(cmd.key), seconds)
+                profile.add("hooks", command_type_name(_registry[cmd.name]._ctype), seconds)
+
+
+def _apply_command(configurations, cmd, all_cmds):
+    if _registry[cmd.name]._returnConfigs:
+        configurations[:] = _registry[cmd.name](args=cmd.args, key=cmd.key, configs=configurations, commands=all_cmds)
+    else:
+        for c in configurations:
+            replargs = [replace_delimited(arg, c, leftdelimiter="{", rightdelimiter="}") for arg in cmd.args]
+            ret = _registry[cmd.name](args=replargs, key=cmd.key, config=c, value=c[cmd.key], configs=configurations, commands=all_cmds)
+            if _registry[cmd.name]._returnValue:
+                c[cmd.key] = ret
 
 
 def replace_command_key(commands, key, newkey):
@@ -62,6 +62,7 @@ Commands
 
 from __future__ import absolute_import
 from dune.testtools.command import meta_ini_command
+from functools import lru_cache
 
 
 class _DummyEnvironment(dict):
@@ -69,12 +70,44 @@ class _DummyEnvironment(dict):
         return key
 
 
-def eval_boolean(s):
-    """ evaluate the given string `s` as a boolean expression """
+def _compile_condition(s):
+    """ compile the given string `s` into a code object, None if it is no valid expression """
     try:
-        return eval(s, _DummyEnvironment())
+        # eval strips leading whitespace from strings, compile does not
+        return compile(s.lstrip(" \t"), "<string>", "eval")
     except SyntaxError:
+        return None
+
+
+# After resolution, many configurations share the exact same condition
+_compiled_conditions = lru_cache(maxsize=1024)(_compile_condition)
+
+
+def set_condition_cache_size(maxsize):
+    """ Set the number of compiled conditions to keep. This clears the cache.
+
+        :param maxsize: The maximum number of cached conditions, None for no limit
+        :type maxsize: int
+    """
+    global _compiled_conditions
+    _compiled_conditions = lru_cache(maxsize=maxsize)(_compile_condition)
+
+
+def condition_cache_info():
+    """ Return the statistics of the cache of compiled conditions
+
+        :returns: The number of hits and misses, the maximum and the current size of the cache
+        :rtype: named tuple as returned by :code:`functools.lru_cache`
+    """
+    return _compiled_conditions.cache_info()
+
+
+def eval_boolean(s):
+    """ evaluate the given string `s` as a boolean expression """
+    code = _compiled_conditions(s)
+    if code is None:
         return False
+    return eval(code, _DummyEnvironment())
 
 
 @meta_ini_command(name="exclude", returnConfigs=True)
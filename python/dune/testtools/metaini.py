@@ -78,85 +78,369 @@ Commands
 
 """
 from __future__ import absolute_import
-from dune.testtools.escapes import exists_unescaped, escaped_split, strip_escapes, replace_delimited, extract_delimited
+from dune.testtools.escapes import exists_unescaped, escaped_split, strip_escapes
 from dune.testtools.parser import parse_ini_file, CommandToApply
+from dune.testtools.parametertree.dotdict import DotDict
+from dune.testtools.profiling import timed
+from dune.testtools.uniquenames import UniqueValues
 from dune.testtools.writeini import write_dict_to_ini
+from array import array
 from copy import deepcopy
-from dune.testtools.command import meta_ini_command, CommandType, apply_commands
+from itertools import islice, product
+from collections import Counter
+import hashlib
+import multiprocessing
+import os
+import re
+from dune.testtools.command import meta_ini_command, command_registry, CommandType, apply_commands
 from six.moves import range
 
 
+# A reference to another key, that does not contain further references
+_reference = re.compile(r"(?<!\\)\{([^{}]+)(?<!\\)\}")
+
+
 def uniquekeys():
     """ Define those keys which are special and should always be made unique """
     return ["__name", "__exec_suffix"]
 
 
+class ExpandedConfiguration(object):
+    """ A configuration resulting from the expansion of a meta ini file
+
+    All configurations expanded from the same configuration share it as their
+    base and only store the values of the expanded keys (copy-on-write). A full
+    DotDict is only materialized, once the expansion is finished.
+    """
+    __slots__ = ("base", "overrides", "_mutable")
+
+    def __init__(self, base, overrides=None, mutable=None):
+        self.base = base
+        self.overrides = overrides if overrides is not None else {}
+        # The keys of the base, whose values are mutable and cannot be shared
+        if mutable is None:
+            mutable = [k for k, v in dict.items(base) if not isinstance(v, str)]
+        self._mutable = mutable
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            key = str(key)
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.base[key]
+
+    def __contains__(self, key):
+        if not isinstance(key, str):
+            key = str(key)
+        return key in self.overrides or key in self.base
+
+    def derive(self, overrides):
+        """ Construct a configuration differing from this one in the given keys """
+        d = dict(self.overrides)
+        d.update(overrides)
+        return ExpandedConfiguration(self.base, d, self._mutable)
+
+    def materialize(self):
+        """ Construct the DotDict representing this configuration """
+        d = self.base.copy()
+        dict.update(d, self.overrides)
+        # values are shared with the base, only mutable ones need to be copied
+        for k in self._mutable:
+            if k not in self.overrides:
+                d[k] = deepcopy(d[k])
+        return d
+
+
 def expand_key(c, keys):
     """ Expand a group of keys together
 
         :param c: A meta ini dictionary
-        :type c: dune.testtools.parametertree.dotdict.DotDict
+        :type c: dune.testtools.parametertree.dotdict.DotDict or ExpandedConfiguration
         :param keys: The keys to be expanded together
         :type keys: string
 
-        :returns: A generator for the resulting configurations
-        :rtype: generator expression
+        :returns: A generator for the resulting configurations, which share c as their base
+        :rtype: generator expression of ExpandedConfiguration
 
     """
+    if not isinstance(c, ExpandedConfiguration):
+        c = ExpandedConfiguration(c)
+
     # first split all given value lists:
     splitted = []
     for k in keys:
         splitted.append(escaped_split(c[k], ","))
 
-    new_ones = [deepcopy(c) for i in range(len(splitted[0]))]
     # now replace all keys correctly:
-    for i, k in enumerate(keys):
-        for j, config in enumerate(new_ones):
-            config[k] = splitted[i][j]
-    for conf in new_ones:
-        yield conf
+    for j in range(len(splitted[0])):
+        yield c.derive([(k, splitted[i][j]) for i, k in enumerate(keys)])
 
 
-@meta_ini_command(name="expand", argc=1, ctype=CommandType.AT_EXPANSION, returnConfigs=True)
-def _expand_command(key=None, configs=None):
-    """Defines the meta ini command expand"""
-    retconfigs = []
-    for conf in configs:
-        retconfigs = retconfigs + list(expand_key(conf, key))
-    return retconfigs
+def expand_product(c, groups, exclude=None):
+    """ Expand several groups of keys, each of which is expanded together
 
+        :param c: A meta ini dictionary
+        :type c: dune.testtools.parametertree.dotdict.DotDict or ExpandedConfiguration
+        :param groups: The groups of keys to be expanded together
+        :type groups: list of lists of strings
+        :param exclude: Conditions to prune the product with, as pairs of the set of expanded keys
+                        a condition depends on and a predicate, that tells whether a configuration
+                        is excluded. A predicate is evaluated as soon as its keys are fixed, such
+                        that excluded branches of the product are never generated.
+        :type exclude: list of pairs of set and function
+
+        :returns: A generator for the configurations in the cartesian product of all groups.
+                  The last group varies fastest, which is the order of applying :func:`expand_key`
+                  for one group after the other.
+        :rtype: generator expression of ExpandedConfiguration
 
-def expand_meta_ini(filename, assignment="=", commentChar="#", whiteFilter=None, blackFilter=None, addNameKey=True):
     """
-    Take a meta ini file and construct the set of ini files it defines
+    if not isinstance(c, ExpandedConfiguration):
+        c = ExpandedConfiguration(c)
+
+    keys = [k for g in groups for k in g]
+    if len(set(keys)) != len(keys):
+        # A key expanded in several groups splits the values of the previous expansion
+        configs = [c]
+        for g in groups:
+            configs = [e for conf in configs for e in expand_key(conf, g)]
+        for conf in configs:
+            yield conf
+        return
+
+    choices = _choices(c, groups)
+    for combination in _combinations(c, groups, choices, exclude):
+        overrides = dict(c.overrides)
+        for group, j in zip(choices, combination):
+            overrides.update(group[j])
+        yield ExpandedConfiguration(c.base, overrides, c._mutable)
+
+
+def _choices(c, groups):
+    """ For each group of expanded keys, the list of overrides for each of its values """
+    choices = []
+    for keys in groups:
+        splitted = [escaped_split(c[k], ",") for k in keys]
+        choices.append([[(k, splitted[i][j]) for i, k in enumerate(keys)] for j in range(len(splitted[0]))])
+    return choices
+
+
+def _combinations(c, groups, choices, exclude):
+    """ The combinations of the values of all groups, as tuples of indices into the choices
+
+        The keys of the groups must not overlap. See :func:`expand_product` for the exclude argument.
+    """
+    if not exclude:
+        for combination in product(*[range(len(group)) for group in choices]):
+            yield combination
+        return
+
+    # Attach each condition to the group, after which all its keys are fixed. The conditions
+    # have to be checked in the order of the exclude commands: A condition might only be
+    # valid for the configurations not excluded by the previous ones. Once a condition would
+    # be checked before a previous one, it and all further ones are left to the exclude commands.
+    checks = [[] for g in groups]
+    deepest = -1
+    for condkeys, predicate in exclude:
+        levels = [i for i, g in enumerate(groups) if condkeys.intersection(g)]
+        level = max(levels) if levels else -1
+        if level < deepest:
+            break
+        deepest = level
+        if levels:
+            checks[level].append(predicate)
+        elif predicate(c):
+            return
+
+    def excluded(conf, predicates):
+        for predicate in predicates:
+            if predicate(conf):
+                return True
+        return False
+
+    def expand(level, overrides, indices):
+        if level == len(groups):
+            yield indices
+            return
+        for j, choice in enumerate(choices[level]):
+            o = dict(overrides)
+            o.update(choice)
+            if checks[level] and excluded(ExpandedConfiguration(c.base, o, c._mutable), checks[level]):
+                continue
+            for combination in expand(level + 1, o, indices + (j,)):
+                yield combination
 
-    Required Arguments:
+    for combination in expand(0, c.overrides, ()):
+        yield combination
 
-    :param filename: The filename of the meta ini file
-    :type filename:  string
 
-    Optional Arguments:
+class ConfigurationTable(object):
+    """ The configurations expanded from a configuration in columnar form
 
-    :type commentChar:  string
-    :param commentChar: A  character that defines comments. Everything on a line
-                        after such character is ignored during the parsing process.
+    Each group of expanded keys has a table of the overrides for each of its
+    values, which all configurations share. A configuration is stored as one
+    index into each of these tables, such that a sweep of many configurations
+    only costs a few bytes per configuration. Configurations are only
+    constructed when accessed.
 
-    :type whiteFilter:  tuple
-    :param whiteFilter: Filter the given keys. The elements of the returned set of
-                        configurations will be unique.
+    :param c: A meta ini dictionary
+    :type c: dune.testtools.parametertree.dotdict.DotDict or ExpandedConfiguration
+    :param groups: The groups of keys to be expanded together
+    :type groups: list of lists of strings
+    :param exclude: Conditions to prune the product with, see :func:`expand_product`
+    """
+    def __init__(self, c, groups, exclude=None):
+        if not isinstance(c, ExpandedConfiguration):
+            c = ExpandedConfiguration(c)
+        keys = [k for g in groups for k in g]
+        if len(set(keys)) != len(keys):
+            # A key expanded in several groups splits the values of the previous expansion.
+            # The resulting overrides form the table of a single column.
+            self.base = ExpandedConfiguration(c.base, None, c._mutable)
+            self.choices = [[list(e.overrides.items()) for e in expand_product(c, groups)]]
+            combinations = ((j,) for j in range(len(self.choices[0])))
+        else:
+            self.base = c
+            self.choices = _choices(c, groups)
+            combinations = _combinations(c, groups, self.choices, exclude)
+        self.width = len(self.choices)
+        self.indices = array("I")
+        self.size = 0
+        for combination in combinations:
+            self.indices.extend(combination)
+            self.size = self.size + 1
+
+    def __len__(self):
+        return self.size
+
+    def rows(self, start, stop):
+        """ The table of the configurations with indices from start to stop
+
+            The new table shares the base configuration and the tables of values.
+        """
+        table = ConfigurationTable.__new__(ConfigurationTable)
+        table.base = self.base
+        table.choices = self.choices
+        table.width = self.width
+        table.indices = self.indices[start * self.width:stop * self.width]
+        table.size = max(0, min(stop, self.size) - start)
+        return table
+
+    def combination(self, i):
+        """ The indices into the tables of the groups of the i-th configuration """
+        return tuple(self.indices[i * self.width:(i + 1) * self.width])
+
+    def overrides(self, combination):
+        """ The values of the expanded keys for the given combination of indices """
+        overrides = dict(self.base.overrides)
+        for group, j in zip(self.choices, combination):
+            overrides.update(group[j])
+        return overrides
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return ExpandedConfiguration(self.base.base, self.overrides(self.combination(i)), self.base._mutable)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+
+def _condition_keys(c, key, expanded, touched):
+    """ All keys the value of the given key refers to, directly or through other keys
+
+        :returns: The set of keys including the given one, None if the references are
+                  only known after resolution or if any key other than the given one
+                  has a command applied
+    """
+    base = c.base if isinstance(c, ExpandedConfiguration) else c
+    closure = set()
+    stack = [key]
+    while stack:
+        k = stack.pop()
+        if k in closure:
+            continue
+        if not dict.__contains__(base, k) or not isinstance(c[k], str) or (k != key and touched[k]):
+            return None
+        closure.add(k)
+        for value in (escaped_split(c[k], ",") if k in expanded else [c[k]]):
+            # nested references are only known after resolution
+            if exists_unescaped(_reference.sub("", value), "{"):
+                return None
+            stack.extend(_reference.findall(value))
+    return closure
+
+
+def _exclude_pushdown(c, cmds, groups):
+    """ Find the exclude conditions, that can already be evaluated during expansion
+
+        A condition can be evaluated as soon as the expanded keys it refers to (directly
+        or through other keys) are fixed. This requires that no other command changes
+        the values involved and that no command changes the set of configurations before
+        the condition is applied. The conditions are given in the order of the exclude
+        commands and end before the first one that cannot be evaluated early. The exclude
+        commands themselves are still applied after resolution, such that the result does
+        not depend on this optimization.
+
+        :returns: The conditions as accepted by the parameter `exclude` of :func:`expand_product`
+    """
+    from dune.testtools.conditionals import eval_boolean
+    registry = command_registry()
+    expanded = set(k for g in groups for k in g)
+    stages = (CommandType.POST_EXPANSION, CommandType.PRE_RESOLUTION, CommandType.AT_RESOLUTION, CommandType.POST_RESOLUTION)
+    touched = Counter(cmd.key for ctype in stages for cmd in cmds[ctype])
+    for ctype in stages[:-1]:
+        for cmd in cmds[ctype]:
+            if registry[cmd.name]._returnConfigs:
+                return []
+
+    conditions = []
+    for cmd in cmds[CommandType.POST_RESOLUTION]:
+        if cmd.name != "exclude":
+            if registry[cmd.name]._returnConfigs:
+                break
+            continue
+        # Later conditions must not be evaluated before this one
+        if touched[cmd.key] != 1:
+            break
+
+        closure = _condition_keys(c, cmd.key, expanded, touched)
+        if closure is None:
+            break
+
+        def predicate(conf, key=cmd.key, keys=sorted(closure), resolver=_Resolver(sorted(closure))):
+            d = dict((k, conf[k]) for k in keys)
+            resolver.resolve(d, set(), lambda d, k: d[k])
+            return bool(eval_boolean(d[key]))
+
+        conditions.append((closure.intersection(expanded), predicate))
+
+    return conditions
 
-    :type blackFilter:  tuple
-    :param blackFilter: The standard assignment operator
 
-    :type addNameKey:  bool
-    :param addNameKey: Whether a key ``__name`` should be in the output. Defaults to true, where
-                       a unique name key is generated from the given name key and added to the
-                       file (even when no generation pattern is given). If set to false, no
-                       name key will be in the output, whether a scheme was given or not.
-    """
+@meta_ini_command(name="expand", argc=1, ctype=CommandType.AT_EXPANSION, returnConfigs=True)
+def _expand_command(key=None, configs=None):
+    """Defines the meta ini command expand"""
+    retconfigs = []
+    for conf in configs:
+        retconfigs.extend(expand_key(conf, key))
+    return retconfigs
+
+
+def _prepare(filename, assignment, commentChar, cache_dir, filters=None):
+    """ Parse a meta ini file and group its expand commands
+
+        If the pair of white and black filters is given as filters, the keys that
+        cannot influence the filtered configurations are removed (see :func:`_prune`).
 
+        :returns: A tuple of the configurations to be expanded, the parsed commands,
+                  the groups of keys to be expanded together and the keys that might
+                  need resolution (see :func:`_reference_graph`)
+    """
     # parse the ini file
-    parse, cmds = parse_ini_file(filename, assignment=assignment, commentChar=commentChar, returnCommands=True)
+    with timed("parse"):
+        parse, cmds = parse_ini_file(filename, assignment=assignment, commentChar=commentChar, returnCommands=True, cache_dir=cache_dir)
 
     # initialize the list of configurations with the parsed configuration
     configurations = [parse]
@@ -179,83 +463,355 @@ def expand_meta_ini(filename, assignment="=", commentChar="#", whiteFilter=None,
         expandlist.append(CommandToApply("expand", [], keylist))
     cmds[CommandType.AT_EXPANSION] = expandlist
 
-    # Now apply expansion through the machinery
-    apply_commands(configurations, cmds[CommandType.AT_EXPANSION], all_cmds=cmds)
+    groups = [expcmd.key for expcmd in cmds[CommandType.AT_EXPANSION]]
+    with timed("dependencies"):
+        if filters is not None:
+            configurations, groups = _prune(configurations, cmds, groups, *filters)
+        resolvable = _reference_graph(configurations, cmds, groups)
+    return configurations, cmds, groups, resolvable
 
-    # HOOK: POST_EXPANSION
-    apply_commands(configurations, cmds[CommandType.POST_EXPANSION], all_cmds=cmds)
 
-    def check_for_unique(d, k):
-        for cta in cmds[CommandType.POST_FILTERING]:
-            if (cta.key == k and cta.name == "unique") or (k in uniquekeys()):
-                raise ValueError("You cannot have keys depend on keys which are marked unique. This is a chicken-egg situation!")
-        return d[k]
+def _tables(filename, assignment, commentChar, cache_dir, whiteFilter=None, blackFilter=None):
+    """ Parse a meta ini file and expand it into tables of configurations
 
-    def resolve_key_dependencies(d):
-        """ replace curly brackets with keys by the appropriate key from the dictionary - recursively """
-        resolved = False
-        for key, value in d.items():
-            if exists_unescaped(value, "}") and exists_unescaped(value, "{"):
-                # Check whether this key has an AT_RESOLUTION command applied
-                lookup_key = extract_delimited(value, leftdelimiter="{", rightdelimiter="}")
-                if lookup_key in [c.key for c in cmds[CommandType.AT_RESOLUTION]]:
-                    continue
+        Only the keys that can influence the configurations after applying the
+        given filters are expanded.
 
-                # split the contents form the innermost curly brackets from the rest
-                d[key] = replace_delimited(value, d, access_func=check_for_unique)
-                resolved = True
+        :returns: A tuple of the list of :class:`ConfigurationTable`, the parsed commands
+                  and the keys that might need resolution
+    """
+    configurations, cmds, groups, resolvable = _prepare(filename, assignment, commentChar, cache_dir, (whiteFilter, blackFilter))
+    # Now apply expansion: the product over all groups is constructed in one pass
+    with timed("expansion"):
+        tables = [ConfigurationTable(c, groups, _exclude_pushdown(c, cmds, groups)) for c in configurations]
+    return tables, cmds, resolvable
 
-        return resolved
 
-    # HOOK: PRE_RESOLUTION
-    apply_commands(configurations, cmds[CommandType.PRE_RESOLUTION], all_cmds=cmds)
+def _expand(filename, assignment, commentChar, cache_dir, whiteFilter=None, blackFilter=None):
+    """ Parse a meta ini file and expand it lazily
 
-    # resolve all key-dependent names present in the configurations
+        :returns: A tuple of a generator for the expanded configurations, the parsed commands
+                  and the keys that might need resolution
+    """
+    tables, cmds, resolvable = _tables(filename, assignment, commentChar, cache_dir, whiteFilter, blackFilter)
+    return (e.materialize() for t in tables for e in t), cmds, resolvable
+
+
+def _unique_error():
+    return ValueError("You cannot have keys depend on keys which are marked unique. This is a chicken-egg situation!")
+
+
+def _unique_keys(cmds):
+    """ The keys that are made unique after filtering and thus cannot be referenced """
+    keys = set(cmd.key for cmd in cmds[CommandType.POST_FILTERING] if cmd.name == "unique")
+    if cmds[CommandType.POST_FILTERING]:
+        keys.update(uniquekeys())
+    return keys
+
+
+def _reference_graph(configurations, cmds, groups):
+    """ Analyse the references between the keys of the configurations to be expanded
+
+        References to unique keys and cycles of references, that are present in all
+        configurations, are reported before expanding. Cycles that depend on the
+        expanded values or on nested references are detected during resolution.
+
+        :returns: A resolver for the keys whose values might contain references, the
+                  only ones to be visited during resolution
+        :rtype: _Resolver
+    """
+    unique = _unique_keys(cmds)
+    expanded = set(k for g in groups for k in g)
+    resolvable = set(cmd.key for ctype in (CommandType.POST_EXPANSION, CommandType.PRE_RESOLUTION, CommandType.AT_RESOLUTION) for cmd in cmds[ctype])
     for c in configurations:
-        # values might depend on keys, whose value also depend on other keys.
-        # In a worst case scenario concerning the order of resolution,
-        # a call to resolve_key_dependencies only resolves one such layer.
-        # That is why we need to do this until all dependencies are resolved.
-        while resolve_key_dependencies(c):
+        # the references present in all configurations
+        graph = {}
+        for k, v in dict.items(c):
+            if not isinstance(v, str) or "{" not in v:
+                continue
+            resolvable.add(k)
+            refs = [set(_reference.findall(value)) for value in (escaped_split(v, ",") if k in expanded else [v])]
+            if unique.intersection(set().union(*refs)):
+                raise _unique_error()
+            graph[k] = [r for r in set.intersection(*refs) if dict.__contains__(c, r)]
+
+        # depth first search for cycles
+        visited = set()
+        for start in graph:
+            if start in visited:
+                continue
+            stack = [(start, iter(graph[start]))]
+            path = [start]
+            visited.add(start)
+            while stack:
+                key, refs = stack[-1]
+                for ref in refs:
+                    if ref in path:
+                        raise ValueError("Cyclic reference in meta ini file: {}".format(" -> ".join(path[path.index(ref):] + [ref])))
+                    if ref not in visited and ref in graph:
+                        visited.add(ref)
+                        path.append(ref)
+                        stack.append((ref, iter(graph[ref])))
+                        break
+                else:
+                    stack.pop()
+                    path.pop()
+
+    return _Resolver(sorted(resolvable))
+
+
+class _Template(object):
+    """ A value compiled into the literal text between its references and the referenced keys """
+    __slots__ = ("literals", "refs", "spans")
+
+    def __init__(self, value, matches):
+        self.literals = []
+        self.refs = []
+        self.spans = []
+        pos = 0
+        for match in matches:
+            self.literals.append(value[pos:match.start()])
+            self.refs.append(match.group(1))
+            self.spans.append(match.span())
+            pos = match.end()
+        self.literals.append(value[pos:])
+
+
+# Marks values, whose references can only be found by substituting one after the other
+_NESTED = object()
+
+
+class _Resolver(object):
+    """ Resolve the references between the values of configurations
+
+        All configurations expanded from a meta ini file share a resolver. Values
+        containing references are compiled into templates once. Resolving a value
+        then only joins the literal text and the referenced values.
+
+        :param keys: The keys whose values might contain references
+        :type keys: list of strings
+    """
+    def __init__(self, keys):
+        self.keys = keys
+        self._templates = {}
+        self._unresolved = {}
+
+    def template(self, value):
+        """ The template for the given value, None if it contains no references """
+        try:
+            return self._templates[value]
+        except KeyError:
             pass
+        matches = list(_reference.finditer(value))
+        if not matches:
+            template = None
+        else:
+            template = _Template(value, matches)
+            # Braces left in the literal text form new references after substitution
+            if True in ["{" in lit and exists_unescaped(lit, "{") for lit in template.literals]:
+                template = _NESTED
+        self._templates[value] = template
+        return template
+
+    def unresolved(self, value):
+        """ Whether the given value still contains curly brackets """
+        try:
+            return self._unresolved[value]
+        except KeyError:
+            result = self._unresolved[value] = exists_unescaped(value, "}") and exists_unescaped(value, "{")
+            return result
+
+    def resolve(self, d, pending, access_func, commands=None, apply=None):
+        """ Resolve the references between the values of a configuration in a single pass
+
+            References are resolved depth first, such that each value is only visited once
+            all values it refers to are resolved. AT_RESOLUTION commands are scheduled within
+            this pass: The commands of a key are applied as soon as its value and the keys
+            referred to by their arguments are resolved, and before any value referring
+            to the key is resolved.
+
+            :param d: The configuration
+            :type d: dune.testtools.parametertree.dotdict.DotDict
+            :param pending: The keys with pending AT_RESOLUTION commands, that are not applied
+                            within this pass. Values referring to these keys are only resolved
+                            up to the first such reference.
+            :type pending: set of strings
+            :param access_func: The function to look up a referenced value
+            :type access_func: function
+            :param commands: The commands to apply within this pass, by key
+            :type commands: dict of lists of CommandToApply
+            :param apply: The function applying a command to the configuration
+            :type apply: function
+        """
+        commands = commands or {}
+        done = set()
+        # The keys currently being resolved, in order
+        path = []
+        templates = self._templates
+
+        def resolve(key):
+            original = value = d[key]
+            template = templates[value] if value in templates else self.template(value)
+            path.append(key)
+            if template is not None and template is not _NESTED:
+                parts = [template.literals[0]]
+                for i, ref in enumerate(template.refs):
+                    # Check whether this key has an AT_RESOLUTION command applied
+                    if ref in pending:
+                        parts.append(value[template.spans[i][0]:])
+                        template = None
+                        break
+                    sub = lookup(ref)
+                    parts.append(sub)
+                    if "{" in sub:
+                        # The substituted value has unresolved references itself
+                        parts.append(value[template.spans[i][1]:])
+                        break
+                    parts.append(template.literals[i + 1])
+                else:
+                    template = None
+                value = "".join(parts)
+
+            # Substitute the innermost references one after the other
+            while template is not None:
+                match = _reference.search(value)
+                if match is None:
+                    break
+                ref = match.group(1)
+                if ref in pending:
+                    break
+                value = value[:match.start()] + lookup(ref) + value[match.end():]
+
+            if value != original:
+                d[key] = value
+
+            for cmd in commands.get(key, ()):
+                # The command is ready once its value and its arguments are resolved
+                argkeys = [ref for arg in cmd.args for ref in _reference.findall(arg)]
+                for ref in argkeys:
+                    lookup(ref)
+                if self.unresolved(d[key]) or True in [self.unresolved(d[ref]) for ref in argkeys]:
+                    raise ValueError("The command '{}' on key '{}' can never be applied: Its value or arguments cannot be resolved".format(cmd.name, key))
+                apply(d, cmd)
+
+            path.pop()
+            done.add(key)
+
+        def lookup(ref):
+            if ref not in done:
+                if ref in path:
+                    raise ValueError("Cyclic reference in meta ini file: {}".format(" -> ".join(path[path.index(ref):] + [ref])))
+                if isinstance(dict.get(d, ref), str):
+                    resolve(ref)
+            return access_func(d, ref)
+
+        for key in self.keys:
+            if key not in done:
+                value = dict.get(d, key)
+                # skip values known to be free of references without further ado
+                if isinstance(value, str) and (templates.get(value, _NESTED) is not None or key in commands):
+                    resolve(key)
+
+
+def _resolve_and_filter(configurations, cmds, resolvable, whiteFilter, blackFilter):
+    """ Apply all steps from the POST_EXPANSION hook up to the filtering to a list of expanded configurations """
+    if not configurations:
+        return configurations
 
-    # If we have AT_RESOLUTION commands present, we need to reiterate resolution
-    # until all of these are resolved!
-    at_resolution_commands = cmds[CommandType.AT_RESOLUTION]
-    while at_resolution_commands:
-        for cmd in cmds[CommandType.AT_RESOLUTION]:
-            skip = False
-            for c in configurations:
-                value = c[cmd.key]
+    # HOOK: POST_EXPANSION
+    apply_commands(configurations, cmds[CommandType.POST_EXPANSION], all_cmds=cmds)
+
+    unique = _unique_keys(cmds)
 
-                # If the value still contains curly brackets, we have to skip this!
-                if exists_unescaped(value, "}") and exists_unescaped(value, "{"):
-                    skip = True
+    def check_for_unique(d, k):
+        if k in unique:
+            raise _unique_error()
+        return d[k]
 
-                # If the argument list still contains curly brackets we do the same
-                for arg in cmd.args:
-                    if exists_unescaped(arg, "}") and exists_unescaped(arg, "{"):
-                        argval = c[extract_delimited(arg, leftdelimiter="{", rightdelimiter="}")]
-                        if exists_unescaped(argval, "}") and exists_unescaped(argval, "{"):
-                            skip = True
+    # AT_RESOLUTION commands are applied to each configuration during resolution.
+    # Those that need the whole list of configurations are applied afterwards.
+    registry = command_registry()
+    listwise = set(cmd.key for cmd in cmds[CommandType.AT_RESOLUTION] if registry[cmd.name]._returnConfigs)
+    scheduled = {}
+    pending = []
+    for cmd in cmds[CommandType.AT_RESOLUTION]:
+        if cmd.key in listwise:
+            pending.append(cmd)
+        else:
+            scheduled.setdefault(cmd.key, []).append(cmd)
 
-            if skip:
-                continue
+    def apply(d, cmd):
+        apply_commands([d], [cmd], all_cmds=cmds)
 
-            apply_commands(configurations, [cmd], all_cmds=cmds)
-            at_resolution_commands.remove(cmd)
+    # HOOK: PRE_RESOLUTION
+    apply_commands(configurations, cmds[CommandType.PRE_RESOLUTION], all_cmds=cmds)
 
+    # resolve all key-dependent names present in the configurations
+    with timed("resolution"):
         for c in configurations:
-            while resolve_key_dependencies(c):
-                pass
+            resolvable.resolve(c, listwise, check_for_unique, scheduled, apply)
+
+    # Apply the remaining commands in rounds, once they are ready for all configurations
+    while pending:
+        ready = None
+        for cmd in pending:
+            argkeys = [ref for arg in cmd.args for ref in _reference.findall(arg)]
+            if True not in [resolvable.unresolved(c[k]) for c in configurations for k in [cmd.key] + argkeys]:
+                ready = cmd
+                break
+        if ready is None:
+            raise ValueError("The commands {} can never be applied: Their values or arguments cannot be resolved".format(", ".join("'{}' on key '{}'".format(cmd.name, cmd.key) for cmd in pending)))
+        apply_commands(configurations, [ready], all_cmds=cmds)
+        pending.remove(ready)
+        remaining = set(cmd.key for cmd in pending)
+        with timed("resolution"):
+            for c in configurations:
+                resolvable.resolve(c, remaining, check_for_unique)
 
     # HOOK: POST_RESOLUTION
     apply_commands(configurations, cmds[CommandType.POST_RESOLUTION], all_cmds=cmds)
 
+    # Commands like exclude might have removed all configurations
+    if not configurations:
+        return configurations
+
     # HOOK: PRE_FILTERING
     apply_commands(configurations, cmds[CommandType.PRE_FILTERING], all_cmds=cmds)
 
-    # Apply filtering
+    # Apply filtering. The keys to keep are determined once for all configurations with the same keys.
+    whiteFilter, blackFilter = _filters(whiteFilter, blackFilter)
+    kept = {}
+    filtered = []
+    with timed("filtering"):
+        for c in configurations:
+            keys = tuple(dict.__iter__(c))
+            if keys not in kept:
+                kept[keys] = _filtered_keys(keys, whiteFilter, blackFilter)
+            d = DotDict()
+            for k in kept[keys]:
+                d[k] = dict.__getitem__(c, k)
+            filtered.append(d)
+
+    return filtered
+
+
+def _filtered_keys(keys, whiteFilter, blackFilter):
+    """ The keys that remain after applying the filters, in their original order
+
+        This is equivalent to filtering with :code:`DotDict.filter`: First with the
+        list of keys not matching the black filter, then with the white filter.
+    """
+    # remove all keys that match the given filtering
+    survivors = set(k for k in keys if True not in [k.startswith(f) for f in blackFilter])
+    keys = [k for k in keys if True in [k[:i] in survivors for i in range(len(k) + 1)]]
+    if whiteFilter:
+        # remove all keys that do not match the given filtering
+        keys = [k for k in keys if True in [k.startswith(f) for f in whiteFilter]]
+    return keys
+
+
+def _filters(whiteFilter, blackFilter):
+    """ Bring the given white and black filters into the form of sequences of key prefixes """
     if blackFilter:
         # check whether a single filter has been given and make a tuple if so
         if not hasattr(blackFilter, '__iter__'):
@@ -265,18 +821,257 @@ def expand_meta_ini(filename, assignment="=", commentChar="#", whiteFilter=None,
 
     # always ignore the section called "__local". Its keys by definition do not influence the number of configuration.
     blackFilter = [f for f in blackFilter] + ["__local"]
-    # remove all keys that match the given filtering
-    configurations = [c.filter([k for k in c if True not in [k.startswith(f) for f in blackFilter]]) for c in configurations]
 
     if whiteFilter:
         # check whether a single filter has been given and make a tuple if so
         if not hasattr(whiteFilter, '__iter__'):
             whiteFilter = (whiteFilter,)
-        # remove all keys that do not match the given filtering
-        configurations = [c.filter(whiteFilter) for c in configurations]
 
-    # remove duplicate configurations - we added hashing to the DotDict class just for this purpose.
-    configurations = [c for c in sorted(set(configurations))]
+    return whiteFilter, blackFilter
+
+
+# The sorted keys of configurations, shared by all configurations with the same keys
+_sorted_keys = {}
+
+
+def _fingerprint(c):
+    """ The canonical form of a configuration: its sorted keys and the values in that order """
+    keys = tuple(sorted(dict.keys(c)))
+    keys = _sorted_keys.setdefault(keys, keys)
+    return keys, tuple([dict.__getitem__(c, k) for k in keys])
+
+
+def _unique_sorted(chunks):
+    """ Remove duplicate configurations and sort the remaining ones
+
+        Duplicates are removed as the chunks of configurations are generated. Each
+        configuration is brought into its canonical form only once. The order is the
+        one given by :code:`DotDict.__lt__`: Configurations are compared by their sorted
+        keys first and by their values in the order of the sorted keys second.
+
+        :param chunks: The configurations, in lists
+        :type chunks: iterable of lists of DotDicts
+    """
+    unique = {}
+    for chunk in chunks:
+        with timed("deduplication"):
+            for c in chunk:
+                unique.setdefault(_fingerprint(c), c)
+    with timed("deduplication"):
+        return [unique[fp] for fp in sorted(unique)]
+
+
+def _unique_chunks(configurations, cmds, resolvable, whiteFilter, blackFilter, chunksize):
+    """ Resolve and filter expanded configurations in chunks of the given size
+
+        Duplicates are removed through a set of hashes of the configurations seen so far.
+
+        :returns: A generator for the chunks of unique configurations
+    """
+    seen = set()
+    while True:
+        chunk = list(islice(configurations, chunksize))
+        if not chunk:
+            return
+        unique = []
+        for c in _resolve_and_filter(chunk, cmds, resolvable, whiteFilter, blackFilter):
+            digest = hashlib.sha1(repr(_fingerprint(c)).encode()).digest()
+            if digest not in seen:
+                seen.add(digest)
+                unique.append(c)
+        yield unique
+
+
+# The number of expanded configurations that are resolved at once
+_RESOLUTION_CHUNKSIZE = 500
+
+
+def _jobs(jobs):
+    """ The number of processes to resolve configurations with
+
+        If not given, the number is read from the environment variable
+        ``DUNE_TESTTOOLS_JOBS``. Zero or a negative number selects all cores.
+        Without the fork start method, see :func:`_pool_context`, a single
+        process is used regardless.
+    """
+    if jobs is None:
+        jobs = os.environ.get("DUNE_TESTTOOLS_JOBS", 1)
+    try:
+        jobs = int(jobs)
+    except ValueError:
+        raise ValueError("The number of jobs has to be an integer, got '{}'".format(jobs))
+    if jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+    return jobs
+
+
+def _pool_context():
+    """ The multiprocessing context to start worker processes with, None if there is none
+
+        The workers have to inherit the registered commands, including the ones
+        registered by the user, and the monkey patches of the parent process.
+        This is only the case for the fork start method, which is not available
+        on all platforms (e.g. on Windows).
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def _shard(shard):
+    """ The shard of the configurations to generate, as a tuple (i, N) of the 1-based index and the number of shards
+
+        A shard can be given as a tuple or as a string like ``2/4``.
+
+        :returns: The tuple (i, N), None to generate all configurations
+    """
+    if not shard:
+        return None
+    try:
+        if isinstance(shard, str):
+            shard = shard.split("/")
+        index, count = (int(x) for x in shard)
+    except ValueError:
+        raise ValueError("A shard has to be given as i/N with integers i and N, got '{}'".format(shard))
+    if not 1 <= index <= count:
+        raise ValueError("The shard index has to be between 1 and the number of shards, got {}/{}".format(index, count))
+    return index, count
+
+
+def _parallelizable(cmds):
+    """ Whether resolution and filtering can be applied to parts of the expanded configurations
+
+        This is the case, unless a command that needs the whole list of
+        configurations is applied in between. The ``exclude`` command treats each
+        configuration on its own.
+    """
+    registry = command_registry()
+    stages = (CommandType.POST_EXPANSION, CommandType.PRE_RESOLUTION, CommandType.AT_RESOLUTION,
+              CommandType.POST_RESOLUTION, CommandType.PRE_FILTERING)
+    return True not in [registry[cmd.name]._returnConfigs and cmd.name != "exclude" for ctype in stages for cmd in cmds[ctype]]
+
+
+def _materialized(tables):
+    """ The configurations of the given tables as DotDicts """
+    with timed("materialization"):
+        return [e.materialize() for t in tables for e in t]
+
+
+def _resolve_rows(task):
+    """ Resolve and filter the configurations of a table in a worker process
+
+        :returns: The items of the resulting configurations
+    """
+    table, cmds, keys, whiteFilter, blackFilter = task
+    configurations = [e.materialize() for e in table]
+    return [list(dict.items(c)) for c in _resolve_and_filter(configurations, cmds, _Resolver(keys), whiteFilter, blackFilter)]
+
+
+def _resolved_chunks(tables, cmds, resolvable, whiteFilter, blackFilter, jobs=1):
+    """ Resolve and filter the configurations of the given tables chunk by chunk
+
+        Configurations are only materialized chunk by chunk, unless a command needs
+        the whole list of configurations. With more than one job, the chunks are
+        resolved by a pool of forked worker processes. Only the tables of the chunks are
+        sent to the workers, which return the items of the resulting configurations.
+        Where processes cannot be forked, the chunks are resolved in this process.
+
+        :returns: A generator of lists of resolved and filtered configurations
+    """
+    if not _parallelizable(cmds):
+        yield _resolve_and_filter(_materialized(tables), cmds, resolvable, whiteFilter, blackFilter)
+        return
+
+    chunks = [t.rows(i, i + _RESOLUTION_CHUNKSIZE) for t in tables for i in range(0, len(t), _RESOLUTION_CHUNKSIZE)]
+    context = _pool_context()
+    if jobs <= 1 or len(chunks) < 2 or context is None:
+        for chunk in chunks:
+            yield _resolve_and_filter(_materialized([chunk]), cmds, resolvable, whiteFilter, blackFilter)
+        return
+
+    pool = context.Pool(jobs)
+    try:
+        tasks = ((chunk, cmds, resolvable.keys, whiteFilter, blackFilter) for chunk in chunks)
+        for result in pool.imap(_resolve_rows, tasks):
+            yield [DotDict(items) for items in result]
+    finally:
+        pool.terminate()
+
+
+def _strip_escapes(c):
+    # Strip escapes TODO: Which charaters should be escaped not to mess with our code?
+    possibly_escaped_chars = "[]{}="
+    for k, v in list(c.items()):
+        # only values containing a backslash can contain escapes
+        if "\\" not in v:
+            continue
+        escaped_value = v
+        for char in possibly_escaped_chars:
+            escaped_value = strip_escapes(escaped_value, char)
+        c[k] = escaped_value
+
+
+def expand_meta_ini(filename, assignment="=", commentChar="#", whiteFilter=None, blackFilter=None, addNameKey=True, cache_dir=None, jobs=None, shard=None, profile=None):
+    """
+    Take a meta ini file and construct the set of ini files it defines
+
+    Required Arguments:
+
+    :param filename: The filename of the meta ini file
+    :type filename:  string
+
+    Optional Arguments:
+
+    :type commentChar:  string
+    :param commentChar: A  character that defines comments. Everything on a line
+                        after such character is ignored during the parsing process.
+
+    :type whiteFilter:  tuple
+    :param whiteFilter: Filter the given keys. The elements of the returned set of
+                        configurations will be unique.
+
+    :type blackFilter:  tuple
+    :param blackFilter: The standard assignment operator
+
+    :type addNameKey:  bool
+    :param addNameKey: Whether a key ``__name`` should be in the output. Defaults to true, where
+                       a unique name key is generated from the given name key and added to the
+                       file (even when no generation pattern is given). If set to false, no
+                       name key will be in the output, whether a scheme was given or not.
+
+    :type cache_dir:  string
+    :param cache_dir: A directory for the persistent parse cache. If omitted, the
+                      meta ini file is always parsed.
+
+    :type jobs:  int
+    :param jobs: The number of processes to resolve and filter the configurations with.
+                 Defaults to the environment variable ``DUNE_TESTTOOLS_JOBS`` or a single
+                 process. Zero selects all cores. The result does not depend on the number
+                 of processes. Worker processes are only used on platforms that can fork
+                 processes (not on Windows), elsewhere a single process is used.
+
+    :type shard:  tuple or string
+    :param shard: Only return the configurations of the i-th of N shards, given as a tuple
+                  (i, N) or a string ``i/N`` with 1 <= i <= N. Every N-th configuration
+                  of the sorted list belongs to the same shard. Duplicates are removed and unique
+                  values are assigned before sharding, so the shards of a meta ini file are
+                  disjoint, together hold all configurations and have the names of a full
+                  expansion.
+
+    :type profile:  dune.testtools.profiling.Profile
+    :param profile: Record the time spent in the phases of the expansion and on each command into
+                    the given profile (see :mod:`dune.testtools.profiling`).
+    """
+    if profile is not None:
+        with profile:
+            return expand_meta_ini(filename, assignment, commentChar, whiteFilter, blackFilter, addNameKey, cache_dir, jobs, shard)
+
+    shard = _shard(shard)
+    tables, cmds, resolvable = _tables(filename, assignment, commentChar, cache_dir, whiteFilter, blackFilter)
+    chunks = _resolved_chunks(tables, cmds, resolvable, whiteFilter, blackFilter, _jobs(jobs))
+
+    # remove duplicate configurations as they are resolved and sort them
+    configurations = _unique_sorted(chunks)
 
     # Implement the naming scheme through the special key __name
     if addNameKey:
@@ -290,20 +1085,299 @@ def expand_meta_ini(filename, assignment="=", commentChar="#", whiteFilter=None,
                 del c["__name"]
 
     # HOOK: POST_FILTERING
-    apply_commands(configurations, cmds[CommandType.POST_FILTERING])
+    with timed("unique"):
+        apply_commands(configurations, cmds[CommandType.POST_FILTERING])
+
+    # Select the shard, once all configurations have their unique values
+    if shard:
+        configurations = configurations[shard[0] - 1::shard[1]]
 
-    # Strip escapes TODO: Which charaters should be escaped not to mess with our code?
-    possibly_escaped_chars = "[]{}="
     for c in configurations:
-        for k, v in list(c.items()):
-            escaped_value = v
-            for char in possibly_escaped_chars:
-                escaped_value = strip_escapes(escaped_value, char)
-            c[k] = escaped_value
+        _strip_escapes(c)
 
     return configurations
 
 
+def expand_meta_ini_stream(filename, assignment="=", commentChar="#", whiteFilter=None, blackFilter=None, addNameKey=True, cache_dir=None, chunksize=100, shard=None):
+    """
+    Take a meta ini file and generate the ini files it defines one after the other
+
+    This is the streaming variant of :func:`expand_meta_ini` for meta ini files
+    whose expansion does not fit into memory at once. The configurations are
+    resolved and filtered in chunks of the given size. Only a hash of each
+    configuration is kept to remove duplicates.
+
+    Unique values (the ``__name`` key and all keys with the :ref:`unique <unique>`
+    command) can only be assigned once all values are known. The meta ini file
+    is therefore expanded twice: The first pass counts the occurrences of the
+    values of these keys, the second pass assigns the unique values on the fly.
+
+    The arguments are those of :func:`expand_meta_ini`, with the addition of
+
+    :type chunksize:  int
+    :param chunksize: The number of configurations to resolve and filter at once
+
+    .. note::
+        The configurations are generated in the order of the expansion instead of
+        the sorted order of :func:`expand_meta_ini`, which also changes the numbering
+        of duplicated unique values and the shards. Other ``POST_FILTERING`` commands
+        are applied after the unique values have been assigned.
+    """
+    shard = _shard(shard)
+
+    def unique_configurations():
+        """ One pass over the expansion, generating the chunks of unique configurations """
+        configurations, cmds, resolvable = _expand(filename, assignment, commentChar, cache_dir, whiteFilter, blackFilter)
+        for chunk in _unique_chunks(configurations, cmds, resolvable, whiteFilter, blackFilter, chunksize):
+            yield chunk, cmds
+
+    def unique_keys(cmds):
+        keys = [cmd.key for cmd in cmds[CommandType.POST_FILTERING] if cmd.name == "unique"]
+        if addNameKey and "__name" not in keys:
+            keys.append("__name")
+        return keys
+
+    # First pass: count the values of all keys that have to be made unique
+    counts = {}
+    for chunk, cmds in unique_configurations():
+        for key in unique_keys(cmds):
+            for c in chunk:
+                if key in c:
+                    counts.setdefault(key, Counter())[c[key]] += 1
+                elif key == "__name":
+                    counts.setdefault(key, Counter())[""] += 1
+
+    # Second pass: assign unique values and generate the configurations
+    unique = dict((key, UniqueValues(count)) for key, count in counts.items())
+    position = 0
+    for chunk, cmds in unique_configurations():
+        with timed("unique"):
+            for c in chunk:
+                if not addNameKey and "__name" in c:
+                    del c["__name"]
+                for key in unique_keys(cmds):
+                    if key in c or key == "__name":
+                        c[key] = unique[key](c.get(key, ""))
+
+        # Select the shard, once the configurations have their unique values
+        position = position + len(chunk)
+        if shard:
+            chunk = [c for i, c in enumerate(chunk, position - len(chunk)) if i % shard[1] == shard[0] - 1]
+
+        # HOOK: POST_FILTERING
+        apply_commands(chunk, [cmd for cmd in cmds[CommandType.POST_FILTERING] if cmd.name != "unique"])
+
+        for c in chunk:
+            _strip_escapes(c)
+            yield c
+
+
+def _referenced_keys(value):
+    """ The keys a value might refer to through curly brackets
+
+        Nested references are only known after resolution. For those, the value
+        itself is returned, which is no key of the configuration.
+    """
+    refs = _reference.findall(value)
+    if exists_unescaped(_reference.sub("", value), "{"):
+        refs.append(value)
+    return refs
+
+
+def _dependencies(c, cmds, keys, all_commands=True):
+    """ The given keys together with all keys their values or the commands depend on
+
+        Commands depend on their key and the keys referenced in their arguments,
+        except for the expand commands and those applied after filtering. A nested
+        reference is only known after resolution and makes all keys dependencies.
+
+        :param c: The parsed configuration
+        :type c: dune.testtools.parametertree.dotdict.DotDict
+        :param keys: The keys to start from
+        :type keys: iterable of strings
+        :param all_commands: Whether all commands are considered. Otherwise, commands that
+                             only compute the value of their key (like ``eval``) are only
+                             considered if their key is a dependency.
+        :type all_commands: bool
+        :returns: The set of keys
+    """
+    allkeys = list(dict.keys(c))
+    registry = command_registry()
+
+    def references(value):
+        refs = set()
+        for ref in _referenced_keys(value):
+            if dict.__contains__(c, ref):
+                refs.add(ref)
+            elif ref in c:
+                # A reference to a section depends on all keys of that section
+                refs.update(k for k in allkeys if k.startswith(ref + "."))
+            else:
+                # The referenced key is only known after resolution
+                return set(allkeys)
+        return refs
+
+    # The keys referenced in the arguments of the commands on each key
+    arguments = {}
+    stack = list(keys)
+    for ctype, cmdlist in cmds.items():
+        if ctype in (CommandType.AT_EXPANSION, CommandType.POST_FILTERING):
+            continue
+        for cmd in cmdlist:
+            refs = set(r for arg in cmd.args for r in references(arg))
+            arguments.setdefault(cmd.key, set()).update(refs)
+            command = registry[cmd.name]
+            if all_commands or command._returnConfigs or not command._returnValue:
+                stack.append(cmd.key)
+
+    result = set()
+    while stack:
+        k = stack.pop()
+        if k in result:
+            continue
+        result.add(k)
+        refs = set(arguments.get(k, ()))
+        if dict.__contains__(c, k) and isinstance(c[k], str):
+            refs.update(references(c[k]))
+        stack.extend(refs - result)
+    return result
+
+
+def _prune(configurations, cmds, groups, whiteFilter, blackFilter):
+    """ Remove the keys that cannot influence the filtered configurations
+
+        These are the keys removed by the filters, that neither the remaining keys
+        nor any command depend on (see :func:`_dependencies`). Groups of expanded keys
+        are only expanded, if one of their keys is kept. The configurations differing
+        only in the removed keys would be identical after filtering and thus be
+        removed as duplicates anyway.
+
+        :returns: A tuple of the configurations and the groups to expand
+    """
+    keys = [k for g in groups for k in g]
+    if len(configurations) != 1 or len(set(keys)) != len(keys):
+        return configurations, groups
+    c = configurations[0]
+    white, black = _filters(whiteFilter, blackFilter)
+
+    def survives(key):
+        return True not in [key.startswith(f) for f in black] and (not white or True in [key.startswith(f) for f in white])
+
+    # The kept groups add all of their keys, whose dependencies are needed as well
+    seeds = [k for k in dict.keys(c) if survives(k)]
+    while True:
+        needed = _dependencies(c, cmds, seeds, all_commands=False)
+        # Keys with a different number of values have to be expanded to report the error
+        kept = [g for g in groups if needed.intersection(g) or len(set(len(escaped_split(c[k], ",")) for k in g)) != 1]
+        siblings = [k for g in kept for k in g if k not in needed]
+        if not siblings:
+            break
+        seeds = seeds + siblings
+    if len(needed) == len(c):
+        return configurations, groups
+
+    pruned = DotDict()
+    for k, v in dict.items(c):
+        if k in needed:
+            pruned[k] = v
+    cmds[CommandType.AT_EXPANSION] = [cmd for cmd in cmds[CommandType.AT_EXPANSION] if cmd.key in kept]
+    return [pruned], kept
+
+
+def count_configurations(filename, assignment="=", commentChar="#", whiteFilter=None, blackFilter=None, section="__static", cache_dir=None, chunksize=100):
+    """
+    Count the configurations a meta ini file expands into, without expanding it
+
+    Groups of expanded keys, whose values are not used by any command or by any
+    reference that could change the number of configurations, contribute a factor
+    that can be read off their value lists. Only the remaining groups are expanded,
+    resolved and filtered, with the values of the independent groups fixed.
+
+    The arguments are those of :func:`expand_meta_ini`, with the addition of
+
+    :type section:  string
+    :param section: The static section to count the static variants of (see :func:`dune.testtools.static_metaini.extract_static_info`)
+
+    :type chunksize:  int
+    :param chunksize: The number of configurations to resolve and filter at once
+
+    :returns: A dictionary with the number of configurations under the key ``total``,
+              the numbers per static variant (given by its exec suffix) under the key ``static``
+              and the numbers per label under the key ``labels``.
+    :rtype: dict
+    """
+    configurations, cmds, groups, resolvable = _prepare(filename, assignment, commentChar, cache_dir)
+    white, black = _filters(whiteFilter, blackFilter)
+
+    def survives(key):
+        return True not in [key.startswith(f) for f in black] and (not white or True in [key.startswith(f) for f in white])
+
+    factor = 1
+    fixed = []
+    keys = [k for g in groups for k in g]
+    if len(configurations) == 1 and len(set(keys)) == len(keys):
+        c = configurations[0]
+        allkeys = list(dict.keys(c))
+
+        # The keys whose values influence the number of configurations or its breakdown
+        seeds = [k for k in allkeys if k.startswith(section + ".")]
+        for k in allkeys:
+            if isinstance(c[k], str):
+                seeds.extend(r for r in _referenced_keys(c[k]) if not survives(r))
+        if True in [r not in c for r in seeds]:
+            # The referenced key is only known after resolution
+            seeds = allkeys
+
+        def is_dependent(g, sensitive):
+            return (sensitive.intersection(g) or len(set(len(escaped_split(c[k], ",")) for k in g)) != 1
+                    or True in [exists_unescaped(c[k], "{") for k in g if survives(k)])
+
+        # The dependent groups are expanded with all of their keys, whose dependencies are sensitive as well
+        while True:
+            sensitive = _dependencies(c, cmds, seeds)
+            siblings = [k for g in groups if is_dependent(g, sensitive) for k in g if k not in sensitive]
+            if not siblings:
+                break
+            seeds = seeds + siblings
+
+        dependent = []
+        for g in groups:
+            kept = [k for k in g if survives(k)]
+            splitted = [escaped_split(c[k], ",") for k in g]
+            if is_dependent(g, sensitive):
+                dependent.append(g)
+                continue
+            # configurations only differ in the values of the keys kept by the filters
+            if kept:
+                factor = factor * len(set(zip(*[escaped_split(c[k], ",") for k in kept])))
+            fixed.extend((k, v[0]) for k, v in zip(g, splitted))
+        groups = dependent
+        configurations = [ExpandedConfiguration(c).derive(fixed)]
+
+    static = {}
+    if True in [section in c for c in configurations]:
+        from dune.testtools.static_metaini import extract_static_info
+        static_info = extract_static_info(filename, section=section, cache_dir=cache_dir)
+        static = dict((static_info[sc], sc) for sc in static_info["__CONFIGS"] if sc in static_info)
+
+    result = {"total": 0, "static": {}, "labels": {}}
+    expanded = (e.materialize() for c in configurations for e in expand_product(c, groups, _exclude_pushdown(c, cmds, groups)))
+    for chunk in _unique_chunks(expanded, cmds, resolvable, whiteFilter, blackFilter, chunksize):
+        for c in chunk:
+            result["total"] += factor
+            if section in c:
+                variant = c[section]
+                _strip_escapes(variant)
+                sc = static.get(variant)
+                if sc is not None:
+                    result["static"][sc] = result["static"].get(sc, 0) + factor
+            if "__LABELS" in c:
+                for label in c["__LABELS"].values():
+                    result["labels"][label] = result["labels"].get(label, 0) + factor
+
+    return result
+
+
 def write_configuration_to_ini(c, metaini, static_info, args, section='__static', prefix=""):
     """Write a configuration to a file
 
@@ -1,69 +1,118 @@
 """ A module defining a dictionary, that allows ot access nested structures by having dots in keys
 
 d["a"]["b"] ==  d["a.b"]
+
+The data is stored with flat dotted keys in a single dictionary. This keeps
+item access, membership tests, :code:`len` and iteration as fast as for a plain
+dictionary. The number of keys within each section is tracked, such that sections
+can be recognized without traversing the data. The keys of a section are kept
+next to each other, so iteration visits the keys grouped by section in the order
+the sections were first used. Accessing a section (like :code:`d["a"]`) returns a
+view on the keys of that section: Modifying it modifies the original dictionary.
+Use :code:`d["a"].copy()` to get an independent DotDict.
 """
 from __future__ import absolute_import
+from copy import deepcopy
 
 
 class DotDict(dict):
+    __slots__ = ("_sections",)
+
     def __init__(self, *args, **kwargs):
-        dict.__init__(self, *args, **kwargs)
+        dict.__init__(self)
+        # maps each section name to the number of keys within that section
+        self._sections = {}
+        self.update(*args, **kwargs)
 
-    def __getitem__(self, key):
-        key = str(key)
-        if "." in key:
-            group, key = key.split(".", 1)
-            return dict.__getitem__(self, group)[key]
-        else:
-            return dict.__getitem__(self, key)
+    def __missing__(self, key):
+        if not isinstance(key, str):
+            return self[str(key)]
+        if key in self._sections:
+            return _SectionView(self, key)
+        raise KeyError(key)
 
     def __setitem__(self, key, value):
-        key = str(key)
-        if "." in key:
-            group, key = key.split(".", 1)
-            if group not in self:
-                dict.__setitem__(self, group, DotDict())
-            dict.__getitem__(self, group).__setitem__(key, value)
-        else:
+        if not isinstance(key, str):
+            key = str(key)
+        if isinstance(value, DotDict):
+            items = [(key + "." + k, v) for k, v in value.items()]
+        elif dict.__contains__(self, key):
             dict.__setitem__(self, key, value)
+            return
+        else:
+            items = [(key, value)]
 
-    def __contains__(self, key):
-        key = str(key)
-        if "." in key:
-            group, key = key.split(".", 1)
-            if group not in self:
-                return False
-            return dict.__getitem__(self, group).__contains__(key)
+        groups = key.split(".")[:-1]
+        prefix = ""
+        for group in groups:
+            prefix = prefix + group
+            if dict.__contains__(self, prefix):
+                raise TypeError("Cannot set key '{}': '{}' is not a section".format(key, prefix))
+            prefix = prefix + "."
+
+        position = self._position(key)
+        if key in self:
+            self.__delitem__(key)
+        # register the new keys with all the sections they are contained in
+        for k, _ in items:
+            prefix = ""
+            for group in k.split(".")[:-1]:
+                prefix = prefix + group
+                self._sections[prefix] = self._sections.get(prefix, 0) + 1
+                prefix = prefix + "."
+        if position is None:
+            dict.update(self, items)
         else:
-            return dict.__contains__(self, key)
+            current = list(dict.items(self))
+            dict.clear(self)
+            dict.update(self, current[:position])
+            dict.update(self, items)
+            dict.update(self, current[position:])
+
+    def _position(self, key):
+        """ The index to insert the given key at to keep sections together, None to append it """
+        if key in self:
+            # a replaced key or section keeps its place
+            prefix = key + "."
+            for i, k in enumerate(dict.__iter__(self)):
+                if k == key or k.startswith(prefix):
+                    return i
+        # a new key goes behind the keys of the innermost section it is contained in
+        group = key
+        while "." in group:
+            group = group.rsplit(".", 1)[0]
+            if group in self._sections:
+                prefix = group + "."
+                if next(reversed(dict.keys(self))).startswith(prefix):
+                    return None
+                found = False
+                for i, k in enumerate(dict.__iter__(self)):
+                    if k.startswith(prefix):
+                        found = True
+                    elif found:
+                        return i
+        return None
+
+    def __contains__(self, key):
+        if not isinstance(key, str):
+            key = str(key)
+        return dict.__contains__(self, key) or key in self._sections
 
     def __delitem__(self, key):
         key = str(key)
-        if "." in key:
-            group, key = key.split(".", 1)
-            dict.__getitem__(self, group).__delitem__(key)
-            if len(dict.__getitem__(self, group)) == 0:
-                dict.__delitem__(self, group)
-        else:
-            dict.__delitem__(self, key)
-
-    def __len__(self):
-        return sum([1 for i in self.__iter__()])
-
-    def __iter__(self, prefix=[]):
-        for i in dict.__iter__(self):
-            if type(self[i]) is DotDict:
-                prefix.append(i)
-                for x in self[i].__iter__(prefix):
-                    yield x
-                prefix.pop()
+        if key in self._sections:
+            for k in [k for k in dict.__iter__(self) if k.startswith(key + ".")]:
+                self.__delitem__(k)
+            return
+        dict.__delitem__(self, key)
+        prefix = ""
+        for group in key.split(".")[:-1]:
+            prefix = prefix + group
+            if self._sections[prefix] == 1:
+                del self._sections[prefix]
             else:
-                def groupname():
-                    result = ""
-                    for p in prefix:
-                        result = result + p + "."
-                    return result
-                yield groupname() + i
+                self._sections[prefix] = self._sections[prefix] - 1
+            prefix = prefix + "."
 
     def __str__(self):
         s = ""
@@ -71,6 +120,24 @@ class DotDict(dict):
             s = s + "'" + str(k) + "': '" + str(v) + "', "
         return "{" + s[:-2] + "}"
 
+    def __reduce__(self):
+        return (DotDict, (list(dict.items(self)),))
+
+    def copy(self):
+        d = DotDict()
+        dict.update(d, self)
+        d._sections = dict(self._sections)
+        return d
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        d = self.copy()
+        for k, v in dict.items(d):
+            if not isinstance(v, str):
+                dict.__setitem__(d, k, deepcopy(v, memo))
+        return d
+
     def filter(self, filterList):
         d = DotDict()
         for k in self:
@@ -78,6 +145,17 @@ class DotDict(dict):
                 d[k] = self[k]
         return d
 
+    def nested(self):
+        """ Return the data as nested (plain) dictionaries, one per section """
+        result = {}
+        for k, v in dict.items(self):
+            d = result
+            groups = k.split(".")
+            for group in groups[:-1]:
+                d = d.setdefault(group, {})
+            d[groups[-1]] = v
+        return result
+
     def __hash__(self):
         return hash(tuple(sorted(self.items())))
 
@@ -102,11 +180,93 @@ class DotDict(dict):
         except KeyError:
             return default
 
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            # detach a section before removing it
+            if isinstance(value, DotDict):
+                value = value.copy()
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def items(self):
+        return list(dict.items(self))
+
+    def keys(self):
+        return list(dict.keys(self))
+
+    def values(self):
+        return list(dict.values(self))
+
+
+class _SectionView(DotDict):
+    """ The keys of a section of a DotDict, without the section prefix
+
+    All accesses are forwarded to the DotDict, so modifying the view
+    modifies the section.
+    """
+    __slots__ = ("_parent", "_prefix")
+
+    def __init__(self, parent, group):
+        dict.__init__(self)
+        self._parent = parent
+        self._prefix = group + "."
+
+    def __getitem__(self, key):
+        return self._parent[self._prefix + str(key)]
+
+    def __setitem__(self, key, value):
+        self._parent[self._prefix + str(key)] = value
+
+    def __delitem__(self, key):
+        del self._parent[self._prefix + str(key)]
+
+    def __contains__(self, key):
+        return self._prefix + str(key) in self._parent
+
+    def __len__(self):
+        return self._parent._sections.get(self._prefix[:-1], 0)
+
+    def __iter__(self):
+        n = len(self._prefix)
+        for k in dict.__iter__(self._parent):
+            if k.startswith(self._prefix):
+                yield k[n:]
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __reduce__(self):
+        return (DotDict, (self.items(),))
+
+    def copy(self):
+        return DotDict(self.items())
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.copy(), memo)
+
+    def nested(self):
+        return self.copy().nested()
+
     def items(self):
-        return [(k, self[k]) for k in self.__iter__()]
+        return [(k, self[k]) for k in self]
 
     def keys(self):
-        return [k for k in self.__iter__()]
+        return list(self)
 
     def values(self):
-        return [self[k] for k in self.__iter__()]
+        return [self[k] for k in self]
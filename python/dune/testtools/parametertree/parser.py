@@ -4,16 +4,23 @@ from __future__ import print_function
 
 from pyparsing import Literal, Optional, restOfLine, Word, alphanums, printables, LineEnd
 from dune.testtools.parametertree.dotdict import DotDict
+import re
 
 
 class DuneIniParser(object):
     # Define a debug logging switch
     _debug = False
 
-    def __init__(self, assignment="=", commentChar="#"):
+    def __init__(self, assignment="=", commentChar="#", fastpath=True):
         self._currentGroup = ''
         self._result = DotDict()
-        self._parser = self.construct_bnf(assignment=assignment, commentChar=commentChar)
+        self._assignment = assignment
+        self._commentChar = commentChar
+        # The grammar is only constructed if a line is not handled by the fast path
+        self._parser = None
+        self._fastpath = None
+        if fastpath:
+            self._fastpath = self.construct_fastpath(assignment=assignment, commentChar=commentChar)
 
     def log(self, s):
         if DuneIniParser._debug:
@@ -38,6 +45,19 @@ class DuneIniParser(object):
 
         return line
 
+    def construct_fastpath(self, assignment="=", commentChar="#"):
+        """ Regular expressions for plain key value pairs, sections, comments and blank lines.
+        They accept exactly what the grammar accepts for these lines, all other lines
+        are left to the grammar.
+        """
+        blank = r"[ \t\r]*"
+        comment = "(?:{}.*)?".format(re.escape(commentChar))
+        valuechars = "".join(re.escape(c) for c in printables if c != commentChar)
+        keyval = re.compile(blank + r"([{}]+)".format(re.escape(alphanums + "-_.")) + blank + re.escape(assignment) + blank + r"([{}][ {}]*)".format(valuechars, valuechars) + blank + comment + blank)
+        section = re.compile(blank + r"\[" + blank + r"([{}]+)".format(re.escape(alphanums + "._")) + blank + r"\]" + blank + comment + blank)
+        empty = re.compile(blank + comment + blank)
+        return keyval, section, empty
+
     def setGroup(self, origString, loc, tokens):
         self.log("Setting current group from '{}' to '{}.'".format(self._currentGroup, tokens[0].strip()))
         self._currentGroup = tokens[0] + "."
@@ -47,15 +67,42 @@ class DuneIniParser(object):
         # store the key value pair for the return dictionary
         self._result[self._currentGroup + tokens[0].strip()] = tokens[1].strip()
 
+    def apply_line(self, line):
+        self.log("Parsing line: {}".format(line))
+        if self._fastpath:
+            keyval, section, empty = self._fastpath
+            m = keyval.fullmatch(line)
+            if m:
+                self._result[self._currentGroup + m.group(1)] = m.group(2).strip()
+                return
+            m = section.fullmatch(line)
+            if m:
+                self._currentGroup = m.group(1) + "."
+                return
+            if empty.fullmatch(line):
+                return
+        if self._parser is None:
+            self._parser = self.construct_bnf(assignment=self._assignment, commentChar=self._commentChar)
+        self._parser.parseString(line)
+
     def apply(self, filename):
         self.log("Parsing file: {}".format(filename))
-        f = open(filename, "r")
-        for line in f:
-            self.log("Parsing line: {}".format(line))
-            self._parser.parseString(line)
+        # Read the file in bulk, large output trees have tens of thousands of lines
+        with open(filename, "r") as f:
+            lines = f.read().split("\n")
+        if not lines[-1]:
+            lines.pop()
+        for line in lines:
+            self.apply_line(line)
 
         return self._result
 
 
-def parse_ini_file(filename):
-    return DuneIniParser().apply(filename)
+def parse_ini_file(filename, fastpath=True):
+    """ Parse a plain Dune ini file into a DotDict
+
+    Unless `fastpath` is disabled, plain key value pairs, sections, comments and
+    blank lines are recognized by regular expressions instead of the grammar.
+    Both variants yield the same result.
+    """
+    return DuneIniParser(fastpath=fastpath).apply(filename)
@@ -0,0 +1,86 @@
+""" A persistent cache for parsed meta ini files
+
+.. currentmodule:: dune.testtools.parsecache
+
+During a CMake configure run, several scripts parse the very same meta ini
+file in separate processes. This module stores the parsing result (the
+:class:`DotDict` and the found commands) in a cache directory in the build
+tree, such that unchanged files only cost hashing and unpickling.
+
+A cache entry is only valid if the meta ini file and all files pulled in
+through ``include`` or ``import`` still have the content they had when the
+entry was written. The parser dialect and the set of registered commands
+are part of the cache key, as they influence the parsing result.
+"""
+from __future__ import absolute_import
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Increase this whenever the format of the stored data changes
+_CACHE_VERSION = 3
+
+
+def file_digest(filename):
+    """ Hash the content of the given file """
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _entry_filename(cache_dir, filename, assignment, commentChar):
+    from dune.testtools.command import command_registry
+    registry = sorted((name, cmd._ctype) for name, cmd in command_registry().items())
+    key = repr((_CACHE_VERSION, os.path.abspath(filename), assignment, commentChar, registry))
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".pickle")
+
+
+def load_cached(cache_dir, filename, assignment="=", commentChar="#"):
+    """ Look up the parsing result of a meta ini file in the cache
+
+        :param cache_dir: The cache directory
+        :type cache_dir: string
+        :param filename: The meta ini file
+        :type filename: string
+
+        :returns: The cached parsing result (the pair of parsed DotDict and found commands)
+                  together with the include graph, None if there is no valid entry
+    """
+    try:
+        with open(_entry_filename(cache_dir, filename, assignment, commentChar), "rb") as f:
+            entry = pickle.load(f)
+        if entry["version"] != _CACHE_VERSION:
+            return None
+        for fn, digest in entry["files"]:
+            if file_digest(fn) != digest:
+                return None
+        return entry["result"], entry["graph"]
+    except Exception:
+        # A missing, outdated or corrupted entry is just a cache miss
+        return None
+
+
+def store_cached(cache_dir, filename, result, graph, assignment="=", commentChar="#"):
+    """ Store the parsing result of a meta ini file in the cache
+
+        :param cache_dir: The cache directory, will be created if necessary
+        :type cache_dir: string
+        :param filename: The meta ini file
+        :type filename: string
+        :param result: The pair of parsed DotDict and found commands
+        :type result: tuple
+        :param graph: The include graph, mapping all involved files to the files they include
+        :type graph: dict
+    """
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    entry = {"version": _CACHE_VERSION,
+             "files": [(fn, file_digest(fn)) for fn in graph],
+             "result": result,
+             "graph": graph,
+             }
+    # Write to a temporary file first to not expose partial entries to concurrent readers
+    fd, tmpname = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpname, _entry_filename(cache_dir, filename, assignment, commentChar))
@@ -3,85 +3,199 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 from pyparsing import Literal, Word, alphanums, Combine, OneOrMore, ZeroOrMore, QuotedString, Optional, restOfLine, printables, oneOf, Group, LineEnd
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+import hashlib
 import os.path
+import re
 from dune.testtools.parametertree.dotdict import DotDict
+from dune.testtools.parsecache import load_cached, store_cached
 
 CommandToApply = namedtuple('CommandToApply', ['name', 'args', 'key'])
 
+# The recorded parse events of included files, see MetaIniParser._processInclude.
+# The least recently used entries are dropped beyond _INCLUDE_MEMO_SIZE entries.
+_include_memo = OrderedDict()
+_INCLUDE_MEMO_SIZE = 256
 
-class MetaIniParser(object):
-    # Define a switch for logging information. This is very useful debugging the parser.
-    _logging = False
+# The include graph of the most recently parsed meta ini file, see include_graph
+_last_graph = {}
 
-    def __init__(self, assignment="=", commentChar="#", path=""):
-        self._path = path
-        self._counter = 0
-        self._currentGroup = ''
-        self._currentDict = DotDict()
 
-        # To avoid cyclic dependencies, we do NOT do this import in the module header
-        from dune.testtools.command import command_registry, command_count
-        self._foundCommands = {i: [] for i in range(command_count())}
-        self._commands = " ".join(command_registry())
-        self._parser = self.construct_bnf(assignment=assignment, commentChar=commentChar)
+class MetaIniGrammar(object):
+    """ The pyparsing grammar of one meta ini dialect
 
-    def log(self, s):
-        if MetaIniParser._logging:
-            print(s)
+    Constructing the grammar costs more than parsing a small ini file. Grammars
+    are therefore compiled once per dialect and set of registered commands and
+    shared by all parsers, see :func:`get_grammar`. The parse actions are
+    forwarded to the :class:`MetaIniParser` currently using the grammar, which
+    holds all the state of the file being parsed.
+    """
+    def __init__(self, assignment="=", commentChar="#", commands=""):
+        self._assignment = assignment
+        self._commentChar = commentChar
+        self._commands = commands
+        self._context = None
+        self.parser = self.construct_bnf(assignment=assignment, commentChar=commentChar)
+        self.fastpath = self.construct_fastpath(assignment=assignment, commentChar=commentChar)
+
+    def action(self, name):
+        """ A parse action that calls the method of given name on the current parser """
+        def forward(origString, loc, tokens):
+            return getattr(self._context, name)(origString, loc, tokens)
+        return forward
+
+    def parse(self, context, element, text):
+        """ Parse text with the given grammar element, forwarding the parse actions to context """
+        previous = self._context
+        self._context = context
+        try:
+            element.parseString(text)
+        finally:
+            self._context = previous
 
     def construct_bnf(self, assignment="=", commentChar="#"):
         """ The EBNF for a normal Dune style ini file. """
         # A comment starts with the comment literal and affects the rest of the line
         comment = Literal(commentChar).suppress() + Optional(restOfLine).suppress()
         # A section is guarded by square brackets
-        section = Literal("[") + Word(alphanums + "._").setParseAction(self.setGroup) + Literal("]")
+        section = Literal("[") + Word(alphanums + "._").setParseAction(self.action("setGroup")) + Literal("]")
         # A key can consist of anything that is not an equal sign
         key = Word(alphanums + "_.")
         # define a command
         command = Group(Literal("|").suppress() + oneOf(self._commands) + ZeroOrMore(Word(alphanums + "_{}", excludeChars=[commentChar, "|"])))
         # A value may contain virtually anything
-        value = Combine(OneOrMore(QuotedString(quoteChar='"', escChar='\\').setParseAction(self.escapeQuoted) | Word(printables + " ", excludeChars=[commentChar, '"', "|"])))
+        value = Combine(OneOrMore(QuotedString(quoteChar='"', escChar='\\').setParseAction(self.action("escapeQuoted")) | Word(printables + " ", excludeChars=[commentChar, '"', "|"])))
         # A key value pair is a concatenation of those 3
-        keyval = (key + Literal(assignment).suppress() + value + ZeroOrMore(command)).setParseAction(self.setKeyValuePair)
+        keyval = (key + Literal(assignment).suppress() + value + ZeroOrMore(command)).setParseAction(self.action("setKeyValuePair"))
         # We allow reading data, that is not of key/value pair form
         # We do lose the embeddedness of our language at this point.
         # An alternative would be to place commands behind ## directive.
-        nonkeyval = (value + OneOrMore(command)).setParseAction(self.setNonKeyValueLine)
+        nonkeyval = (value + OneOrMore(command)).setParseAction(self.action("setNonKeyValueLine"))
         # Introduce the include statement here, although I do like it anymore.
-        include = oneOf("include import") + Word(printables, excludeChars=commentChar).setParseAction(self.processInclude)
+        include = oneOf("include import") + Word(printables, excludeChars=commentChar).setParseAction(self.action("processInclude"))
         # Define the priority between the different sorts of lines. Important: keyval >> nonkeyval
         content = keyval | section | include | nonkeyval
         line = Optional(content) + Optional(comment) + LineEnd()
 
         return line
 
+    def construct_fastpath(self, assignment="=", commentChar="#"):
+        """ Regular expressions for the most frequent line shapes: Blank lines, comments,
+        sections and key value pairs without quotes or commands. They accept exactly
+        what the grammar accepts for these shapes, all other lines are left to the grammar.
+        """
+        comment = "(?:{}.*)?".format(re.escape(commentChar))
+        valuechars = "".join(re.escape(c) for c in printables if c not in ('"', '|', commentChar))
+        keyval = re.compile(r" *([{}]+) *{} *([{}][ {}]*)".format(re.escape(alphanums + "_."), re.escape(assignment), valuechars, valuechars) + comment)
+        section = re.compile(r" *\[ *([{}]+) *\] *".format(re.escape(alphanums + "._")) + comment)
+        blank = re.compile(r"[ \t]*" + comment)
+        return keyval, section, blank
+
+
+# The compiled grammars, see get_grammar
+_grammars = {}
+
+
+def get_grammar(assignment="=", commentChar="#"):
+    """ Get the compiled grammar for the given dialect and the currently registered commands """
+    # To avoid cyclic dependencies, we do NOT do this import in the module header
+    from dune.testtools.command import command_registry
+    commands = " ".join(command_registry())
+    key = (assignment, commentChar, commands)
+    if key not in _grammars:
+        _grammars[key] = MetaIniGrammar(assignment=assignment, commentChar=commentChar, commands=commands)
+    return _grammars[key]
+
+
+class MetaIniParser(object):
+    # Define a switch for logging information. This is very useful debugging the parser.
+    _logging = False
+
+    def __init__(self, assignment="=", commentChar="#", path="", fastpath=True):
+        self._path = path
+        self._counter = 0
+        self._currentGroup = ''
+        self._currentDict = DotDict()
+        self._includes = []
+        self._includeGraph = {}
+        self._fileStack = []
+        self._recordings = []
+
+        # To avoid cyclic dependencies, we do NOT do this import in the module header
+        from dune.testtools.command import command_count
+        self._foundCommands = {i: [] for i in range(command_count())}
+        self._grammar = get_grammar(assignment=assignment, commentChar=commentChar)
+        self._dialect = (assignment, commentChar, self._grammar._commands)
+        self._fastpath = self._grammar.fastpath if fastpath else None
+
+    def log(self, s):
+        if MetaIniParser._logging:
+            print(s)
+
+    def match_fast(self, line):
+        """ Match a line against the fast path. Returns the parse action to apply together
+        with its tokens or None if the line needs the full grammar.
+        """
+        if not self._fastpath:
+            return None
+        if line.endswith("\n"):
+            line = line[:-1]
+        keyval, section, blank = self._fastpath
+        m = keyval.fullmatch(line)
+        if m:
+            return self.setKeyValuePair, m.groups()
+        m = section.fullmatch(line)
+        if m:
+            return self.setGroup, m.groups()
+        if blank.fullmatch(line):
+            return None, ()
+        return None
+
     def escapeQuoted(self, origString, loc, tokens):
         self.log("Going to escape {}".format(tokens[0].strip()))
         for char in ",|":
             tokens[0] = tokens[0].replace(char, "\\" + char)
 
+    def record(self, action, *args):
+        """ Apply a parse event to the result and record it for the file currently being included """
+        if self._recordings:
+            self._recordings[-1].append((action.__name__, args))
+        action(*args)
+
     def setGroup(self, origString, loc, tokens):
-        self.log("Setting current group from '{}' to '{}.'".format(self._currentGroup, tokens[0].strip()))
-        self._currentGroup = tokens[0] + "."
+        self.record(self._setGroup, tokens[0])
 
     def setKeyValuePair(self, origString, loc, tokens):
-        self.log("Setting KV pair ('{}', '{}') within group '{}'".format(tokens[0].strip(), tokens[1].strip(), self._currentGroup))
+        self.record(self._setKeyValuePair, tokens[0], tokens[1], [list(command) for command in tokens[2:]])
+
+    def setNonKeyValueLine(self, origString, loc, tokens):
+        self.record(self._setNonKeyValueLine, tokens[0], [list(command) for command in tokens[1:]])
+
+    def processInclude(self, origString, loc, tokens):
+        self.record(self._processInclude, tokens[0])
+
+    def _setGroup(self, group):
+        self.log("Setting current group from '{}' to '{}.'".format(self._currentGroup, group.strip()))
+        self._currentGroup = group + "."
+
+    def _setKeyValuePair(self, key, value, commands):
+        self.log("Setting KV pair ('{}', '{}') within group '{}'".format(key.strip(), value.strip(), self._currentGroup))
         # store the key value pair for the return dictionary
-        self._currentDict[self._currentGroup + tokens[0].strip()] = tokens[1].strip()
+        self._currentDict[self._currentGroup + key.strip()] = value.strip()
         # store the found commands
-        for command in tokens[2:]:
+        for command in commands:
             self.log("  with an applied command: '{}'".format(command))
-            commandtuple = CommandToApply(command[0], command[1:], self._currentGroup + tokens[0].strip())
+            commandtuple = CommandToApply(command[0], command[1:], self._currentGroup + key.strip())
             from dune.testtools.command import command_registry
             self._foundCommands[command_registry()[command[0]]._ctype].append(commandtuple)
 
-    def setNonKeyValueLine(self, origString, loc, tokens):
-        self.log("Setting Non-KV line: {}".format(tokens[0].strip()))
+    def _setNonKeyValueLine(self, value, commands):
+        self.log("Setting Non-KV line: {}".format(value.strip()))
         # store the given value under a special section
-        self._currentDict['__local.conditionals.' + str(self._counter)] = tokens[0].strip()
+        self._currentDict['__local.conditionals.' + str(self._counter)] = value.strip()
         # store the found commands
-        for command in tokens[1:]:
+        for command in commands:
             self.log("  with an applied command: '{}'".format(command))
             commandtuple = CommandToApply(command[0], command[1:], '__local.conditionals.' + str(self._counter))
             from dune.testtools.command import command_registry
@@ -89,32 +203,152 @@ class MetaIniParser(object):
         # increase the counter
         self._counter = self._counter + 1
 
-    def processInclude(self, origString, loc, tokens):
-        self.log("Processing include directive from {}".format(tokens[0].strip()))
+    def _processInclude(self, include):
+        self.log("Processing include directive from {}".format(include.strip()))
         self._currentGroup = ''
-        # Parse the include
-        incfile = open(os.path.join(self._path, tokens[0]), "r")
-        for line in incfile:
-            self.apply(line)
+        incfile = os.path.normpath(os.path.join(self._path, include))
+        self._includes.append(incfile)
+        if self._fileStack:
+            self._includeGraph.setdefault(self._fileStack[-1], []).append(incfile)
+        self._includeGraph.setdefault(incfile, [])
+        with self.within_file(incfile):
+            with open(incfile, "r") as f:
+                text = f.read()
+            # An included file is parsed only once per process. Its parse events are
+            # recorded and replayed wherever the same file content is included again.
+            memokey = (os.path.abspath(incfile), hashlib.sha1(text.encode()).hexdigest(), self._dialect)
+            events = _include_memo.get(memokey)
+            if events is None:
+                self._recordings.append([])
+                try:
+                    self.apply_lines(text)
+                finally:
+                    events = self._recordings.pop()
+                _include_memo[memokey] = events
+                while len(_include_memo) > _INCLUDE_MEMO_SIZE:
+                    _include_memo.popitem(last=False)
+            else:
+                _include_memo.move_to_end(memokey)
+                self.log("Replaying memoized include {}".format(incfile))
+                for action, args in events:
+                    getattr(self, action)(*args)
         # Reset current File and group
         self._currentGroup = ''
 
+    @contextmanager
+    def within_file(self, filename):
+        """ Mark the given file as being parsed, detecting cyclic includes """
+        filename = os.path.normpath(filename)
+        self._includeGraph.setdefault(filename, [])
+        if filename in self._fileStack:
+            chain = self._fileStack[self._fileStack.index(filename):] + [filename]
+            raise ValueError("Cyclic include in meta ini files: {}".format(" -> ".join(chain)))
+        self._fileStack.append(filename)
+        try:
+            yield
+        finally:
+            self._fileStack.pop()
+
     def apply(self, line):
         self.log("Parsing line: {}".format(line))
-        self._parser.parseString(line)
+        match = self.match_fast(line)
+        if match:
+            action, tokens = match
+            if action:
+                action(line, 0, tokens)
+        else:
+            self._grammar.parse(self, self._grammar.parser, line)
+
+    def apply_lines(self, text):
+        """ Parse a chunk of meta ini lines """
+        lines = text.split("\n")
+        for line in lines[:-1]:
+            self.apply(line + "\n")
+        if lines[-1]:
+            self.apply(lines[-1])
+
+    def apply_file(self, filename):
+        self.log("Parsing file: {}".format(filename))
+        with self.within_file(filename):
+            with open(filename, "r") as f:
+                self.apply_lines(f.read())
 
     def result(self):
         return (self._currentDict, self._foundCommands)
 
+    def includes(self):
+        """ The files that were included so far, in the order of their inclusion """
+        return self._includes
+
+    def include_graph(self):
+        """ The include graph of the files parsed so far: A dictionary mapping
+        each file to the list of files it directly includes.
+        """
+        return self._includeGraph
+
 
 # This is backwards compatibility, we could as  well skip it.
-def parse_ini_file(filename, assignment="=", commentChar="#", returnCommands=False):
-    """ Take an inifile and parse it into a DotDict """
-    parser = MetaIniParser(assignment=assignment, commentChar=commentChar, path=os.path.dirname(filename))
-    file = open(filename, "r")
-    for line in file:
-        parser.apply(line)
+def parse_ini_file(filename, assignment="=", commentChar="#", returnCommands=False, fastpath=True, cache_dir=None):
+    """ Take an inifile and parse it into a DotDict
+
+    Unless `fastpath` is disabled, plain key value pairs, sections, comments and
+    blank lines are recognized by regular expressions and bypass the grammar
+    altogether. Both variants yield the same result.
+
+    If a `cache_dir` is given, the result is looked up in and stored to the
+    persistent parse cache in that directory, see :mod:`dune.testtools.parsecache`.
+    """
+    result, _ = _parse(filename, assignment, commentChar, fastpath, cache_dir)
     if returnCommands:
-        return parser.result()
+        return result
     else:
-        return parser.result()[0]
+        return result[0]
+
+
+def include_graph(filename, assignment="=", commentChar="#", cache_dir=None):
+    """ Determine the include graph of a meta ini file
+
+    Returns a dictionary that maps the given file and all files it includes
+    (directly or indirectly) to the list of files they directly include.
+
+    If the file has just been parsed (e.g. during its expansion) and none of the
+    involved files changed since, the include graph of that parse is returned.
+    """
+    key = (os.path.abspath(filename), assignment, commentChar)
+    if _last_graph.get("key") == key and _last_graph["stamps"] == _stamps(_last_graph["graph"]):
+        return _last_graph["graph"]
+    return _parse(filename, assignment, commentChar, True, cache_dir)[1]
+
+
+def _stamps(graph):
+    """ The modification times and sizes of the files in an include graph """
+    stamps = []
+    for fn in sorted(graph):
+        try:
+            st = os.stat(fn)
+            stamps.append((fn, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append((fn, None, None))
+    return stamps
+
+
+def _remember_graph(filename, assignment, commentChar, graph):
+    _last_graph.clear()
+    _last_graph.update(key=(os.path.abspath(filename), assignment, commentChar), graph=graph, stamps=_stamps(graph))
+
+
+def _parse(filename, assignment, commentChar, fastpath, cache_dir):
+    cached = None
+    if cache_dir:
+        cached = load_cached(cache_dir, filename, assignment=assignment, commentChar=commentChar)
+    if cached is not None:
+        _remember_graph(filename, assignment, commentChar, cached[1])
+        return cached
+
+    parser = MetaIniParser(assignment=assignment, commentChar=commentChar, path=os.path.dirname(filename), fastpath=fastpath)
+    parser.apply_file(filename)
+    result = parser.result()
+    if cache_dir:
+        store_cached(cache_dir, filename, result, parser.include_graph(), assignment=assignment, commentChar=commentChar)
+    _remember_graph(filename, assignment, commentChar, parser.include_graph())
+    return result, parser.include_graph()
@@ -0,0 +1,124 @@
+""" Opt-in timing of the phases of the meta ini pipeline
+
+.. currentmodule:: dune.testtools.profiling
+
+A :class:`Profile` records the wall time and the number of calls of
+
+* the phases of :func:`dune.testtools.metaini.expand_meta_ini` (parsing, dependencies,
+  expansion, materialization, resolution, filtering, deduplication and assigning
+  unique values) and of extracting the static information and writing the ini files,
+* the command hooks (like ``POST_RESOLUTION``),
+* each meta ini command by its name and
+* the commands applied to each key.
+
+Profiling is disabled unless a profile is active. Activate one with a ``with``
+statement around the code to measure:
+
+.. code-block:: python
+
+    from dune.testtools.profiling import Profile
+
+    with Profile() as profile:
+        expand_meta_ini("test.mini")
+    print(profile.report())
+    profile.write_json("profile.json")
+
+The phases are nested: The time of the ``resolution`` phase includes the time
+of the commands applied during resolution. Configurations resolved by worker
+processes (see the ``jobs`` argument of :func:`dune.testtools.metaini.expand_meta_ini`)
+only contribute the time the main process waits for them.
+"""
+from __future__ import absolute_import
+from contextlib import contextmanager
+import json
+import time
+
+# The currently active profile, None if profiling is disabled
+_active = None
+
+# The categories of measurements, in the order of the report
+CATEGORIES = ("phases", "hooks", "commands", "keys")
+
+
+class Profile(object):
+    """ The wall time and call counts of the phases of the meta ini pipeline
+
+    The measurements are stored in :code:`records`, which maps each of the
+    :data:`CATEGORIES` to a dictionary from the measured names to pairs of the
+    number of calls and the total time in seconds.
+    """
+    def __init__(self):
+        self.records = dict((category, {}) for category in CATEGORIES)
+        self._previous = []
+
+    def __enter__(self):
+        global _active
+        self._previous.append(_active)
+        _active = self
+        return self
+
+    def __exit__(self, *args):
+        global _active
+        _active = self._previous.pop()
+
+    def add(self, category, name, seconds, calls=1):
+        """ Record calls to the given name that took the given time """
+        record = self.records[category].setdefault(name, [0, 0.])
+        record[0] = record[0] + calls
+        record[1] = record[1] + seconds
+
+    def to_dict(self):
+        """ The measurements as a dictionary suitable for JSON export """
+        return dict((category, dict((name, {"calls": calls, "seconds": seconds}) for name, (calls, seconds) in records.items()))
+                    for category, records in self.records.items())
+
+    def write_json(self, filename):
+        """ Export the measurements into a JSON file """
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def report(self, limit=10):
+        """ A human-readable summary of the measurements
+
+            :param limit: The maximum number of entries per category, the slowest ones are shown
+            :type limit: int
+            :rtype: string
+        """
+        lines = []
+        for category in CATEGORIES:
+            records = sorted(self.records[category].items(), key=lambda r: (-r[1][1], r[0]))
+            if not records:
+                continue
+            lines.append("{}:".format(category.capitalize()))
+            width = max(len(name) for name, _ in records[:limit])
+            for name, (calls, seconds) in records[:limit]:
+                lines.append("  {}  {:10.4f} s  {:8d} calls".format(name.ljust(width), seconds, calls))
+            if len(records) > limit:
+                lines.append("  ... and {} more".format(len(records) - limit))
+        return "\n".join(lines)
+
+
+def active_profile():
+    """ The currently active profile, None if profiling is disabled """
+    return _active
+
+
+@contextmanager
+def _measure(profile, category, name):
+    start = time.time()
+    try:
+        yield
+    finally:
+        profile.add(category, name, time.time() - start)
+
+
+@contextmanager
+def _disabled():
+    yield
+
+
+def timed(name, category="phases"):
+    """ A context manager measuring its body as a call to the given name, if profiling is active """
+    if _active is None:
+        return _disabled()
+    return _measure(_active, category, name)
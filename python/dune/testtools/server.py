@@ -0,0 +1,224 @@
+""" A server running the CMake interface scripts in a long-running process
+
+.. currentmodule:: dune.testtools.server
+
+Each call to one of the scripts ``dune_has_static_section.py``,
+``dune_extract_static.py`` or ``dune_expand_metaini.py`` starts a Python
+interpreter and imports pyparsing and all meta ini commands. A server started
+through ``dune_metaini_server.py`` keeps these imported, together with the
+compiled grammars and the registered commands, across CMake reconfigures.
+
+The scripts are thin clients: If the environment variable ``DUNE_TESTTOOLS_SERVER``
+names the Unix socket of a running server, the script call is forwarded to it.
+Otherwise, or if no server listens on the socket, the script does its work
+in-process.
+
+Only the user running the server may use it: The socket is created accessible
+to its owner only, and connections from processes of other users are closed
+unanswered. Place the socket in a directory private to the user, like
+``$XDG_RUNTIME_DIR``, and not directly in a world-writable directory like ``/tmp``.
+
+A request is a single line of JSON holding the name of the script, its
+arguments, the working directory and the environment variables starting
+with ``DUNE_TESTTOOLS_`` of the client. The server answers with a single line
+of JSON holding the exit status and the output of the script. Requests are
+handled one after the other.
+"""
+from __future__ import absolute_import
+from io import StringIO
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+# The environment variable naming the socket of the server
+SERVER_VARIABLE = "DUNE_TESTTOOLS_SERVER"
+
+
+def _receive_line(connection):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        data = data + chunk
+    return data
+
+
+def _send_line(connection, message):
+    connection.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _environment():
+    return dict((k, v) for k, v in os.environ.items() if k.startswith("DUNE_TESTTOOLS_") and k != SERVER_VARIABLE)
+
+
+def _run(script, argv):
+    """ Run a script in this process and return its exit status """
+    from dune.testtools.batch import _scripts
+    parser, func = _scripts[script]
+    try:
+        return func(vars(parser().parse_args(argv)))
+    except SystemExit as e:
+        # Like the interpreter: No code means success, a message means failure
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        sys.stderr.write("{}\n".format(e.code))
+        return 1
+
+
+def _handle(request):
+    """ Run the script of a request, with the output and the environment of the client """
+    import traceback
+    stdout, stderr, cwd, environ = sys.stdout, sys.stderr, os.getcwd(), dict(os.environ)
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        os.chdir(request["cwd"])
+        for k in [k for k in os.environ if k.startswith("DUNE_TESTTOOLS_")]:
+            del os.environ[k]
+        os.environ.update(request["environment"])
+        try:
+            status = _run(request["script"], request["argv"])
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        return {"status": status, "stdout": sys.stdout.getvalue(), "stderr": sys.stderr.getvalue()}
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def _remove_stale_socket(path):
+    """ Remove the socket of a server that is no longer running
+
+        Raises a ValueError if the path is not a socket or a server listens on it.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except OSError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError("Cannot listen on {}: The file exists and is not a socket".format(path))
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise ValueError("Cannot listen on {}: A server is already running".format(path))
+
+
+def _same_user(connection):
+    """ Whether the peer of a connection runs as the user of this process """
+    if not hasattr(socket, "SO_PEERCRED"):
+        # Without peer credentials, rely on the permissions of the socket
+        return True
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def serve(path):
+    """ Answer requests on the given Unix socket until a shutdown request arrives
+
+        :param path: The filename of the socket. It should be located in a directory
+                     that only the current user can write to.
+        :type path: string
+    """
+    # Preload everything the scripts need
+    import dune.testtools.metaini  # noqa: F401
+    import dune.testtools.static_metaini  # noqa: F401
+    import dune.testtools.cmakeoutput  # noqa: F401
+
+    _remove_stale_socket(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    bound = False
+    try:
+        # Create the socket accessible to its owner only
+        umask = os.umask(0o077)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(umask)
+        bound = True
+        server.listen(16)
+        while True:
+            connection, _ = server.accept()
+            try:
+                if not _same_user(connection):
+                    continue
+                request = json.loads(_receive_line(connection).decode())
+                if request.get("shutdown"):
+                    _send_line(connection, {"status": 0})
+                    return
+                _send_line(connection, _handle(request))
+            except Exception:
+                # A broken client must not take down the server
+                pass
+            finally:
+                connection.close()
+    finally:
+        server.close()
+        if bound and os.path.exists(path):
+            os.remove(path)
+
+
+def request(path, message):
+    """ Send a request to the server on the given socket
+
+        :returns: The answer of the server, None if no server of the current user is running
+    """
+    # Do not send requests to a server of another user
+    try:
+        if os.stat(path).st_uid != os.getuid():
+            return None
+    except OSError:
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            connection.connect(path)
+        except (OSError, socket.error):
+            return None
+        _send_line(connection, message)
+        answer = _receive_line(connection)
+        return json.loads(answer.decode()) if answer else None
+    finally:
+        connection.close()
+
+
+def shutdown(path):
+    """ Stop the server on the given socket
+
+        :returns: Whether a server was running
+    """
+    return request(path, {"shutdown": True}) is not None
+
+
+def run_script(script, argv=None):
+    """ Run one of the CMake interface scripts, on the server if one is running
+
+        :param script: The name of the script, e.g. ``dune_expand_metaini.py``
+        :type script: string
+        :param argv: The arguments to the script, defaults to the command line arguments
+        :type argv: list
+        :returns: The exit status of the script
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    path = os.environ.get(SERVER_VARIABLE)
+    if path:
+        answer = request(path, {"script": script, "argv": argv, "cwd": os.getcwd(), "environment": _environment()})
+        if answer is not None:
+            sys.stdout.write(answer["stdout"])
+            sys.stderr.write(answer["stderr"])
+            return answer["status"]
+    return _run(script, argv)
@@ -4,8 +4,8 @@ from dune.testtools.metaini import expand_meta_ini
 from dune.testtools.command import apply_commands
 
 
-def extract_static_info(metaini, section='__static', add_guards=False):
-    static_section = expand_meta_ini(metaini, whiteFilter=(section, "__exec_suffix", "__cmake_guards"), addNameKey=False)
+def extract_static_info(metaini, section='__static', add_guards=False, cache_dir=None):
+    static_section = expand_meta_ini(metaini, whiteFilter=(section, "__exec_suffix", "__cmake_guards"), addNameKey=False, cache_dir=cache_dir)
 
     # make the found exec suffixes unique
     if "__exec_suffix" not in static_section[0]:
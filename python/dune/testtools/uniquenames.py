@@ -29,38 +29,64 @@ Commands
 """
 from __future__ import absolute_import
 from dune.testtools.command import meta_ini_command, CommandType
+from collections import Counter
 
 
-@meta_ini_command(name="unique", ctype=CommandType.POST_FILTERING, returnValue=False)
+@meta_ini_command(name="unique", ctype=CommandType.POST_FILTERING, returnConfigs=True)
 def make_key_unique(configs=None, key=None):
     """Defines the meta ini command ``unique``"""
-    # first count the number of occurences of the values
-    key_dict = {}
     for c in configs:
         # If the key isnt even in the dict, add it as "" to allow a numbered scheme
         if key not in c:
             c[key] = ""
-        if c[key] not in key_dict:
-            key_dict[c[key]] = 1
-        else:
-            key_dict[c[key]] += 1
-
-    # Now delete all those that appeared only once (those are unique already) and reset all the others to 0
-    for k, count in list(key_dict.items()):
-        if count == 1:
-            del key_dict[k]
-        else:
-            key_dict[k] = 0
-
-    # Now make the values unique
+    unique = UniqueValues(Counter(c[key] for c in configs))
     for c in configs:
-        # Check whether this value was found multiple times. If so, it has to be made unique.
-        if c[key] in key_dict:
-            # increase the counter in key_dict for the given key
-            key_dict[c[key]] += 1
-
-            # check whether we have numbering only (doesnt need an underscore)
-            if c[key] == "":
-                c[key] = str(key_dict[""] - 1).zfill(4)
-            else:
-                c[key] = c[key] + "_" + str(key_dict[c[key]] - 1).zfill(4)
+        c[key] = unique(c[key])
+    return configs
+
+
+def _numbered(value, number):
+    # check whether we have numbering only (doesnt need an underscore)
+    if value == "":
+        return str(number).zfill(4)
+    return value + "_" + str(number).zfill(4)
+
+
+class UniqueValues(object):
+    """ Make values unique by appending a counter to duplicates
+
+    Appending a counter might produce a value that already existed, so renaming
+    happens in several rounds until all values are unique. The number of
+    occurrences of all values has to be known beforehand. The values are then
+    renamed one after the other, which allows to rename a stream of configurations
+    that does not fit into memory at once.
+
+    :param counts: The number of occurrences of each value
+    :type counts: dict or collections.Counter
+    """
+    def __init__(self, counts):
+        # For each round, the set of duplicated values and the counters handed out so far
+        self._rounds = []
+        counts = Counter(counts)
+        while True:
+            duplicates = set(v for v, n in counts.items() if n > 1)
+            if not duplicates:
+                break
+            self._rounds.append((duplicates, Counter()))
+            newcounts = Counter()
+            for v, n in counts.items():
+                if v in duplicates:
+                    for i in range(n):
+                        newcounts[_numbered(v, i)] += 1
+                else:
+                    newcounts[v] += n
+            counts = newcounts
+
+    def __call__(self, value):
+        """ Return the unique replacement for the next occurrence of value """
+        for duplicates, counters in self._rounds:
+            if value in duplicates:
+                number = counters[value]
+                counters[value] = number + 1
+                value = _numbered(value, number)
+        return value
@@ -6,6 +6,8 @@ This module provides functions to write a dictionary representing
 an ini file to a stream or to file (ini file).
 
 """
+from __future__ import absolute_import
+from dune.testtools.parametertree.dotdict import DotDict
 
 
 def write_to_stream(d, stream, assignment="="):
@@ -41,6 +43,8 @@ def write_to_stream(d, stream, assignment="="):
                 stream.write("\n[{}]\n".format(groupname(pre)))
                 traverse_dict(stream, value, pre)
 
+    if isinstance(d, DotDict):
+        d = d.nested()
     prefix = []
     traverse_dict(stream, d, prefix)
 
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+
+"""
+A script that runs the CMake interface scripts for many meta ini files at once.
+
+To be called from CMake, if the option ``DUNE_TESTTOOLS_BATCH_EXPANSION`` is
+enabled. The given manifest lists calls to ``dune_has_static_section.py``,
+``dune_extract_static.py`` and ``dune_expand_metaini.py``, which are all run
+within this process, see :mod:`dune.testtools.batch` for the format. This saves
+starting a Python interpreter per call.
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.batch import run_manifest
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--manifest', help='The manifest listing the script calls', required=True)
+    args = vars(parser.parse_args())
+
+    # Failing calls are recorded in their status files and repeated by CMake to report the error
+    run_manifest(args['manifest'])
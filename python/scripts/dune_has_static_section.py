@@ -11,17 +11,7 @@ variations and at most one executable has to be generated.
 """
 if __name__ == "__main__":
 
-    from dune.testtools.metaini import expand_meta_ini
-    import argparse
+    from dune.testtools.server import run_script
     import sys
 
-    # define the argument parser for this script
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--ini', help='The inifile', required=True)
-    parser.add_argument('-s', '--section', default="__static", help='The section to treat as the static section (defaults to __static)')
-    args = vars(parser.parse_args())
-
-    configurations = expand_meta_ini(args['ini'], whiteFilter=(args['section'],), addNameKey=False)
-    if len(configurations) > 1:
-        sys.exit(1)
-    sys.exit(0)
+    sys.exit(run_script("dune_has_static_section.py"))
@@ -17,10 +17,20 @@ any detected irregularities in your meta ini files. Given that the expansion
 process was successful, you can interactively step through the resulting
 ini files.
 
+To only learn how many tests a meta ini file produces, pass ``--count``. The
+number of configurations is then computed without expanding the whole file,
+along with the numbers per static variant and per label.
+
+To learn where the time of expanding a meta ini file goes, pass ``--profile``.
+The time spent in each phase of the expansion, in each command hook, on each
+command and on the commands of each key is then printed. With ``--profile-json``,
+these measurements are exported into a JSON file, e.g. to track them across releases.
+
 """
 if __name__ == "__main__":
 
-    from dune.testtools.metaini import expand_meta_ini
+    from dune.testtools.metaini import expand_meta_ini, count_configurations
+    from dune.testtools.profiling import Profile
     from dune.testtools.parser import parse_ini_file, MetaIniParser
     from dune.testtools.writeini import write_to_stream
     import argparse
@@ -63,10 +73,10 @@ if __name__ == "__main__":
             if v[0] == "=":
                 print("WARNING: '{}={}' parsed as key-value-pair. Use double quotes to enforce a conditional.".format(k, v))
 
-    def check_expansion(ini):
+    def check_expansion(ini, profile=None):
         # Now try doing the expansion and output some statistics:
         try:
-            exp = expand_meta_ini(ini)
+            exp = expand_meta_ini(ini, profile=profile)
         except Exception as e:
             print(e)
             print("Expanding the meta ini file failed.")
@@ -107,9 +117,34 @@ if __name__ == "__main__":
         if interactive or input().lower() == "y":
             inspect_interactive(configs)
 
+    def profiling(ini, json_file=None):
+        profile = Profile()
+        check_expansion(ini, profile=profile)
+        print("\nTime spent on expanding the meta ini file:\n")
+        print(profile.report())
+        if json_file:
+            profile.write_json(json_file)
+
+    def count(ini):
+        counts = count_configurations(ini)
+        print("The meta ini file expands into {} configurations.".format(counts["total"]))
+        for name, title in (("static", "Static variants"), ("labels", "Labels")):
+            if counts[name]:
+                print("\n{}:".format(title))
+                for key, n in sorted(counts[name].items()):
+                    print("  {}: {}".format(key or "(no suffix)", n))
+
     # define the argument parser for this script
     parser = argparse.ArgumentParser()
     parser.add_argument('inifile', type=str, nargs=1)
     parser.add_argument('-i', '--interactive', action="store_true", help="Whether to interactvely investigate the data")
+    parser.add_argument('-n', '--count', action="store_true", help="Only print the number of configurations")
+    parser.add_argument('-p', '--profile', action="store_true", help="Only print the time spent in each phase of the expansion")
+    parser.add_argument('--profile-json', default=None, help="Export the time spent in each phase of the expansion into the given JSON file")
     args = vars(parser.parse_args())
-    analysis(args['inifile'][0], interactive=args['interactive'])
+    if args['count']:
+        count(args['inifile'][0])
+    elif args['profile'] or args['profile_json']:
+        profiling(args['inifile'][0], json_file=args['profile_json'])
+    else:
+        analysis(args['inifile'][0], interactive=args['interactive'])
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+"""
+A script that starts or stops a server for the meta ini scripts.
+
+The scripts ``dune_has_static_section.py``, ``dune_extract_static.py`` and
+``dune_expand_metaini.py`` forward their work to the server listening on the
+Unix socket given by the environment variable ``DUNE_TESTTOOLS_SERVER``. This
+avoids the startup of the Python interpreter and the imports on every call,
+e.g. during repeated CMake reconfigures:
+
+.. code-block:: shell
+
+    export DUNE_TESTTOOLS_SERVER=$XDG_RUNTIME_DIR/dune-testtools.socket
+    ./<build directory>/run-in-dune-env dune_metaini_server.py &
+
+The socket should be located in a directory that only the current user can
+write to, like ``$XDG_RUNTIME_DIR``. Only processes of the user that started
+the server are answered.
+The server has to be restarted after updating ``dune-testtools``.
+
+"""
+if __name__ == "__main__":
+
+    from dune.testtools.server import serve, shutdown, SERVER_VARIABLE
+    import argparse
+    import os
+    import sys
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', default=os.environ.get(SERVER_VARIABLE), help='The Unix socket to listen on (defaults to the value of {})'.format(SERVER_VARIABLE))
+    parser.add_argument('--stop', action="store_true", help='Stop the server listening on the socket')
+    args = vars(parser.parse_args())
+
+    if not args['socket']:
+        parser.error("No socket given, use --socket or set {}".format(SERVER_VARIABLE))
+    if args['stop']:
+        sys.exit(0 if shutdown(args['socket']) else 1)
+    serve(args['socket'])
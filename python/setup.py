@@ -7,9 +7,11 @@ from setuptools.command.test import test as TestCommand
 
 def dune_testtools_scripts():
     return ['./scripts/dune_metaini_analysis.py',
+            './scripts/dune_expand_batch.py',
             './scripts/dune_expand_metaini.py',
             './scripts/dune_extract_static.py',
             './scripts/dune_has_static_section.py',
+            './scripts/dune_metaini_server.py',
             './wrapper/dune_convergencetest.py',
             './wrapper/dune_execute.py',
             './wrapper/dune_execute_parallel.py',
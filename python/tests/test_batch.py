@@ -0,0 +1,23 @@
+from __future__ import absolute_import
+from dune.testtools.batch import run_manifest, extract_static, extract_static_parser
+
+
+def test_run_manifest(dir, tmpdir):
+    manifest = tmpdir.join("manifest")
+    result = tmpdir.join("result dir")
+    missing = tmpdir.join("missing.mini")
+    manifest.write("\n".join(['"{0}/has_static" dune_has_static_section.py --ini {1}static1.mini',
+                              '"{0}/static" dune_extract_static.py --ini {1}static1.mini --file "{0}/static.log"',
+                              '"{0}/expand" dune_expand_metaini.py --cmake --ini {1}metaini1.mini --dir "{0}/ini" --file "{0}/expand.log"',
+                              '"{0}/missing" dune_has_static_section.py --ini {2}',
+                              ]).format(result, dir, missing))
+    assert(run_manifest(str(manifest)) == 1)
+    assert(result.join("has_static").read() == "1")
+    assert(result.join("static").read() == "0" and result.join("expand").read() == "0")
+    assert(result.join("missing").read().startswith("error\n"))
+    assert(len(result.join("ini").listdir()) == 72)
+
+    # The results are the same as those of the single scripts
+    single = tmpdir.join("static.log")
+    extract_static(vars(extract_static_parser().parse_args(["--ini", dir + "static1.mini", "--file", str(single)])))
+    assert(single.read() == result.join("static.log").read())
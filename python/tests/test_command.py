@@ -44,3 +44,16 @@ def test_zfill_command(dir):
     for conf in c:
         assert(conf["number_str"] in vals)
         vals.discard(conf["number_str"])
+
+
+def test_resolution_command_order(tmpdir):
+    import pytest
+    ini = tmpdir.join("chain.mini")
+    # commands are scheduled by their dependencies, not by their order in the file
+    ini.write("z = {e2} | zfill 4\ne2 = {e1}*{n} | eval\ne1 = {x}+1 | eval\nn = 1+1 | eval\nx = 1, 2 | expand\n")
+    c = expand_meta_ini(str(ini))
+    assert(sorted(conf["z"] for conf in c) == ["0004", "0006"])
+
+    ini.write("x = }{ | eval\n")
+    with pytest.raises(ValueError, match="can never be applied"):
+        expand_meta_ini(str(ini))
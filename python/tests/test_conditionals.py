@@ -82,3 +82,14 @@ def test_double_command(dir):
     assert(len(result) == 2)
     assert(result[0]["bla"] == 'BLA')
     assert(result[1]["bla"] == 'BLUBB')
+
+
+def test_condition_cache():
+    from dune.testtools.conditionals import condition_cache_info, set_condition_cache_size
+    set_condition_cache_size(2)
+    assert(eval_boolean("1 == 1") and not eval_boolean("1 == 2") and eval_boolean("1 == 1"))
+    assert(not eval_boolean("1 =="))
+    assert(eval_boolean("  'x' == x"))
+    info = condition_cache_info()
+    assert(info.hits == 1 and info.misses == 4 and info.currsize == 2)
+    set_condition_cache_size(1024)
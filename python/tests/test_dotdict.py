@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+from dune.testtools.parametertree.dotdict import DotDict
+import copy
+import pickle
+
+
+def test_dotdict_sections():
+    d = DotDict()
+    d["a.b.c"] = "1"
+    d["a.d"] = "2"
+    d["e"] = "3"
+    assert(len(d) == 3)
+    assert(sorted(d.keys()) == ["a.b.c", "a.d", "e"])
+    assert("a" in d and "a.b" in d and "a.b.c" in d and "b" not in d)
+    assert(d["a"]["b"]["c"] == "1")
+    assert(d["a"].items() == [("b.c", "1"), ("d", "2")])
+    assert(d.nested() == {"a": {"b": {"c": "1"}, "d": "2"}, "e": "3"})
+
+    # Deleting the last key of a section removes the section
+    del d["a.b.c"]
+    assert("a.b" not in d and "a" in d)
+    # Setting a value replaces an entire section
+    d["a"] = "x"
+    assert(d.items() == [("a", "x"), ("e", "3")])
+    # Setting a DotDict inserts a section
+    d["f"] = d.filter(["e"])
+    assert(d["f.e"] == "3" and len(d) == 3)
+
+
+def test_dotdict_copies():
+    d = DotDict()
+    d["a.b"] = "1"
+    d["c"] = ["x"]
+    for other in [d.copy(), copy.deepcopy(d), pickle.loads(pickle.dumps(d))]:
+        assert(type(other) is DotDict)
+        assert(other == d)
+        other["a.z"] = "2"
+        assert("a.z" not in d)
+    assert(copy.deepcopy(d)["c"] is not d["c"])
+    assert(d.setdefault("a.b", "2") == "1" and d.setdefault("a.y", "2") == "2")
+    assert(d.pop("a") == DotDict({"b": "1", "y": "2"}) and "a" not in d)
+
+
+def test_dotdict_section_views():
+    d = DotDict()
+    d["a.x"] = "1"
+    d["b"] = "2"
+    d["a.y"] = "3"
+    # Keys are grouped by section in the order the sections were first used
+    assert(d.keys() == ["a.x", "a.y", "b"])
+
+    # Modifying a section modifies the dictionary
+    section = d["a"]
+    section["x"] = "changed"
+    section.setdefault("c.z", "4")
+    del section["y"]
+    assert(d["a.x"] == "changed" and d["a.c.z"] == "4" and "a.y" not in d)
+    assert(d.keys() == ["a.x", "a.c.z", "b"])
+    assert(len(section) == 2 and section.keys() == ["x", "c.z"])
+
+    # Copies and popped sections are detached
+    copied = section.copy()
+    assert(type(pickle.loads(pickle.dumps(section))) is DotDict)
+    popped = d.pop("a")
+    assert(type(copied) is DotDict and copied == popped)
+    assert(popped.keys() == ["x", "c.z"] and d.keys() == ["b"])
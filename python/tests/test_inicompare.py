@@ -40,3 +40,17 @@ def test_inicompare_exact(dir):
     assert(fuzzy_compare_ini(dir + "tmp.out", dir + "tmp2.out") == 1)
     assert(fuzzy_compare_ini(dir + "tmp.out", dir + "tmp2.out", exclude=['b']) == 0)
     assert(fuzzy_compare_ini(dir + "tmp.out", dir + "tmp2.out", zeroValueThreshold={'b': 1e-14}) == 0)
+
+
+def test_parse_output_tree(dir):
+    from dune.testtools.parametertree.parser import parse_ini_file
+    f = open(dir + "tmp.out", 'w')
+    f.write("a = 2 # comment\n\n[ group.sub ]\nb-c = 3.0 \t\n  # comment\nd = \"x = y\"\ne=\t1 2  \n[other]\nf = 1")
+    f.close()
+
+    parsed = parse_ini_file(dir + "tmp.out")
+    assert(parsed.items() == parse_ini_file(dir + "tmp.out", fastpath=False).items())
+    assert(parsed['group.sub.b-c'] == '3.0')
+    assert(parsed['group.sub.d'] == '"x = y"')
+    assert(parsed['group.sub.e'] == '1 2')
+    assert(parsed['other.f'] == '1')
@@ -25,3 +25,235 @@ def test_metaini1(dir):
 def test_metaini2(dir):
     configs = expand_meta_ini(dir + "metaini2.mini")
     assert(len(configs) == 24)
+
+
+def test_expand_key_copy_on_write():
+    from dune.testtools.metaini import expand_key
+    from dune.testtools.parametertree.dotdict import DotDict
+    base = DotDict()
+    base["a"] = "1, 2"
+    base["b"] = "x, y"
+    base["c.d"] = "shared"
+    base["c.l"] = ["mutable"]
+    configs = list(expand_key(base, ["a", "b"]))
+    assert(len(configs) == 2)
+    # The expanded configurations share the base and only store the expanded keys
+    assert(configs[1].base is base and configs[1].overrides == {"a": "2", "b": "y"})
+    c = configs[1].materialize()
+    assert(c.items() == [("a", "2"), ("b", "y"), ("c.d", "shared"), ("c.l", ["mutable"])])
+    assert(c["c.l"] is not base["c.l"] and base["a"] == "1, 2")
+
+
+def test_expand_product_order():
+    from dune.testtools.metaini import expand_key, expand_product
+    from dune.testtools.parametertree.dotdict import DotDict
+    base = DotDict()
+    base["a"] = "1, 2"
+    base["b"] = "x, y, z"
+    base["c"] = "3, 4"
+    groups = [["a", "c"], ["b"]]
+    # The product has to be in the same order as the sequential expansion of the groups
+    sequential = [base]
+    for g in groups:
+        sequential = [e for conf in sequential for e in expand_key(conf, g)]
+    product = list(expand_product(base, groups))
+    assert(len(product) == 6)
+    assert([c.overrides for c in product] == [c.overrides for c in sequential])
+    # Expanding the same key twice splits the previously expanded values
+    base["a"] = "1\\, 2, 3"
+    assert([c["a"] for c in expand_product(base, [["a"], ["a"]])] == ["1", "2", "3"])
+
+
+def test_expand_stream(dir):
+    from dune.testtools.metaini import expand_meta_ini_stream
+
+    def without_unique(configs):
+        return sorted(tuple(sorted((k, v) for k, v in c.items() if k not in ("__name", "x"))) for c in configs)
+
+    configs = expand_meta_ini(dir + "metaini1.mini")
+    for chunksize in (1, 7, 100):
+        stream = list(expand_meta_ini_stream(dir + "metaini1.mini", chunksize=chunksize))
+        assert(without_unique(stream) == without_unique(configs))
+        # The numbering follows the order of the expansion, but the values are unique
+        assert(len(set(c["x"] for c in stream)) == 72)
+        assert(sorted(c["__name"] for c in stream) == sorted(c["__name"] for c in configs))
+
+    stream = list(expand_meta_ini_stream(dir + "metaini1.mini", whiteFilter=("g", "a"), chunksize=5))
+    assert(len(stream) == 24)
+
+
+def test_unique_values():
+    from dune.testtools.uniquenames import UniqueValues
+    from collections import Counter
+    values = ["a", "a", "a_0000", "", ""]
+    unique = UniqueValues(Counter(values))
+    assert([unique(v) for v in values] == ["a_0000_0000", "a_0001", "a_0000_0001", "0000", "0001"])
+
+
+def test_count_configurations(dir):
+    from dune.testtools.metaini import count_configurations
+    counts = count_configurations(dir + "metaini1.mini")
+    assert(counts["total"] == 72 and counts["static"] == {} and counts["labels"] == {})
+    assert(count_configurations(dir + "metaini1.mini", whiteFilter=("g", "a"))["total"] == 24)
+    assert(count_configurations(dir + "metaini1.mini", blackFilter=["a"])["total"] == 36)
+    assert(count_configurations(dir + "metaini2.mini", whiteFilter=("g",))["total"] == 16)
+
+    # Excluded configurations and labels are evaluated
+    assert(count_configurations(dir + "cond1.mini")["total"] == len(expand_meta_ini(dir + "cond1.mini")))
+    counts = count_configurations(dir + "cond2.mini")
+    assert(counts["total"] == 4 and counts["labels"] == {"NIGHTLY": 2, "DEF": 1, "BLA": 1, "BLUBB": 2})
+
+    # Static variants depending on expanded keys outside of the static section
+    counts = count_configurations(dir + "static1.mini")
+    assert(counts["total"] == 6 and counts["static"] == {"G1_0000": 1, "G1_0001": 1, "G2_0000": 1, "G2_0001": 1, "G3": 2})
+
+
+def test_count_configurations_dependencies(tmpdir):
+    from dune.testtools.metaini import count_configurations
+    # A key of an expanded group references a plain key
+    ini = tmpdir.join("sibling.mini")
+    ini.write("a = 1, 2 | expand g\nb = {c}, y | expand g\nc = lit\n[__static]\nS = {a}\n")
+    counts = count_configurations(str(ini))
+    assert(counts["total"] == 2 and sorted(counts["static"].values()) == [1, 1])
+
+    # All configurations of the first chunk are excluded
+    ini = tmpdir.join("excluded_chunk.mini")
+    ini.write("level = 0, 1 | expand\nb = {} | expand\ncells = 2**{{level}} | eval\ncoarse = {{cells}} == 1 | exclude\nprio = quick | label {{b}}\n".format(", ".join(str(i) for i in range(600))))
+    assert(count_configurations(str(ini))["total"] == 600)
+
+
+def test_resolution_order(tmpdir):
+    import pytest
+    chain = tmpdir.join("chain.mini")
+    chain.write("__name = {c}\nc = {b}_c\nb = {a}_b\na = 1, 2 | expand\n")
+    configs = expand_meta_ini(str(chain))
+    assert([c["__name"] for c in configs] == ["1_b_c", "2_b_c"])
+
+    # cycles present in all configurations are reported before expansion
+    cycle = tmpdir.join("cycle.mini")
+    cycle.write("a = {b}\nb = {c}_x\nc = {a}\n")
+    with pytest.raises(ValueError, match="a -> b -> c -> a"):
+        expand_meta_ini(str(cycle))
+
+    # cycles depending on the expanded values are detected during resolution
+    cycle.write("a = {b}, x | expand\nb = y, {a} | expand\n")
+    with pytest.raises(ValueError, match="Cyclic reference"):
+        expand_meta_ini(str(cycle))
+    cycle.write("a = {b}, x | expand 1\nb = y, {a} | expand 1\n")
+    assert(len(expand_meta_ini(str(cycle))) == 2)
+
+
+def test_resolution_templates(tmpdir):
+    ini = tmpdir.join("templates.mini")
+    ini.write("a = 1, 2 | expand\nb = {a}*2 | eval\nc = {b}_{a}_\\{a}\nd = {e{a}}\ne1 = x\ne2 = y\n")
+    configs = expand_meta_ini(str(ini), addNameKey=False)
+    assert([(c["b"], c["c"], c["d"]) for c in configs] == [("2", "2_1_{a}", "x"), ("4", "4_2_{a}", "y")])
+
+
+def test_exclude_pushdown(tmpdir):
+    from dune.testtools.metaini import expand_product
+    from dune.testtools.parametertree.dotdict import DotDict
+    base = DotDict()
+    base["a"] = "1, 2, 3"
+    base["b"] = "1, 2"
+    base["c"] = "x, y"
+    # Excluded branches of the product are not generated
+    seen = []
+
+    def predicate(conf):
+        seen.append(conf["a"])
+        return conf["a"] == "2"
+    configs = list(expand_product(base, [["a"], ["b"], ["c"]], exclude=[(set(["a"]), predicate)]))
+    assert(seen == ["1", "2", "3"])
+    assert([(c["a"], c["b"], c["c"]) for c in configs] == [(a, b, c) for a in "13" for b in "12" for c in "xy"])
+
+    # The result is the same as excluding after resolution
+    ini = tmpdir.join("exclude.mini")
+    ini.write("a = 1, 2, 3 | expand\nb = 1, 2 | expand\nc = x, y | expand\nsum = {a}+{b}\n{sum} == 3 | exclude\n{c} == y and {a} == 1 | exclude\n")
+    configs = expand_meta_ini(str(ini), addNameKey=False)
+    expected = [(a, b, c) for a in "123" for b in "12" for c in "xy" if int(a) + int(b) != 3 and not (c == "y" and a == "1")]
+    assert(sorted((c["a"], c["b"], c["c"]) for c in configs) == expected)
+
+    # Exclude commands are applied in order: The second condition is only valid for the
+    # configurations that the first one keeps
+    ini = tmpdir.join("exclude_order.mini")
+    ini.write("a = 0, 1, 2 | expand\nb = 0, 1 | expand\nex1 = {b} == 0 or {a} == 0 | exclude\nex2 = 1 / {a} > 5 | exclude\n")
+    configs = expand_meta_ini(str(ini), addNameKey=False)
+    assert(sorted((c["a"], c["b"]) for c in configs) == [("1", "1"), ("2", "1")])
+    from dune.testtools.static_metaini import extract_static_info
+    assert(len(extract_static_info(str(ini))["__CONFIGS"]) == 1)
+
+
+def test_expand_parallel(dir, monkeypatch):
+    import dune.testtools.metaini
+    # Split even small meta ini files into several chunks to have them resolved by the workers
+    monkeypatch.setattr(dune.testtools.metaini, "_RESOLUTION_CHUNKSIZE", 5)
+    for f in ("metaini1.mini", "metaini2.mini", "cond1.mini"):
+        assert(repr(expand_meta_ini(dir + f, jobs=2)) == repr(expand_meta_ini(dir + f)))
+    monkeypatch.setenv("DUNE_TESTTOOLS_JOBS", "2")
+    assert(len(expand_meta_ini(dir + "metaini1.mini", blackFilter=["a"])) == 36)
+    # Without fork, the configurations are resolved in this process
+    monkeypatch.setattr(dune.testtools.metaini.multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    monkeypatch.setattr(dune.testtools.metaini.multiprocessing, "get_context", None)
+    assert(repr(expand_meta_ini(dir + "metaini1.mini")) == repr(expand_meta_ini(dir + "metaini1.mini", jobs=1)))
+
+
+def test_expand_excluded_chunk(tmpdir):
+    # All configurations of the first chunk are excluded before another command is applied
+    ini = tmpdir.join("excluded_chunk.mini")
+    ini.write("level = 0, 1 | expand\nb = {} | expand\ncells = 2**{{level}} | eval\ncoarse = {{cells}} == 1 | exclude\nprio = quick | label {{b}}\n".format(", ".join(str(i) for i in range(600))))
+    configs = expand_meta_ini(str(ini))
+    assert(len(configs) == 600)
+    assert(set(c["level"] for c in configs) == set(["1"]))
+
+
+def test_expand_stream_excluded_chunk(tmpdir):
+    from dune.testtools.metaini import expand_meta_ini_stream
+    # The first chunks of the stream are excluded entirely
+    ini = tmpdir.join("excluded_chunk.mini")
+    ini.write("level = 0, 1 | expand\nb = {} | expand\ncells = 2**{{level}} | eval\ncoarse = {{cells}} == 1 | exclude\nprio = quick | label {{b}}\n".format(", ".join(str(i) for i in range(600))))
+    configs = list(expand_meta_ini_stream(str(ini)))
+    assert(len(configs) == 600)
+    assert(set(c["level"] for c in configs) == set(["1"]))
+
+
+def test_unique_sorted():
+    from dune.testtools.metaini import _unique_sorted
+    from dune.testtools.parametertree.dotdict import DotDict
+    configs = [DotDict(d) for d in ({"a": "2", "b": "1"}, {"a": "1", "c": "0"}, {"a": "2", "b": "1"}, {"a": "1", "b": "3"}, {"b": "0"})]
+    # The order is that of sorting the DotDicts themselves
+    assert([c.items() for c in _unique_sorted([configs])] == [c.items() for c in sorted(set(configs))])
+    assert(len(_unique_sorted([configs])) == 4)
+
+
+def test_configuration_table():
+    from dune.testtools.metaini import ConfigurationTable, expand_product
+    from dune.testtools.parametertree.dotdict import DotDict
+    base = DotDict({"a": "1, 2, 3", "b": "x, y", "c": "const"})
+    groups = [["a"], ["b"]]
+    table = ConfigurationTable(base, groups)
+    assert(len(table) == 6)
+    # The table yields the same configurations as expand_product
+    assert([e.materialize().items() for e in table] == [e.materialize().items() for e in expand_product(base, groups)])
+    # A slice of rows shares the base configuration and the value lists
+    rows = table.rows(4, 10)
+    assert(len(rows) == 2 and rows.choices is table.choices)
+    assert([(e["a"], e["b"]) for e in rows] == [("3", "x"), ("3", "y")])
+
+
+def test_expand_shard(dir):
+    import pytest
+    from dune.testtools.metaini import expand_meta_ini_stream
+    for f in ("metaini1.mini", "metaini2.mini"):
+        full = [repr(c) for c in expand_meta_ini(dir + f)]
+        shards = [[repr(c) for c in expand_meta_ini(dir + f, shard="{}/3".format(i))] for i in range(1, 4)]
+        # The shards partition the full expansion, including the unique names
+        assert(sorted(c for s in shards for c in s) == sorted(full))
+        assert(max(len(s) for s in shards) - min(len(s) for s in shards) <= 1)
+        stream = [repr(c) for c in expand_meta_ini_stream(dir + f)]
+        shards = [[repr(c) for c in expand_meta_ini_stream(dir + f, shard=(i, 3))] for i in range(1, 4)]
+        assert(sorted(c for s in shards for c in s) == sorted(stream))
+    with pytest.raises(ValueError):
+        expand_meta_ini(dir + "metaini1.mini", shard="4/3")
+    with pytest.raises(ValueError):
+        expand_meta_ini(dir + "metaini1.mini", shard="1-3")
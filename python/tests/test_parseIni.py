@@ -1,4 +1,5 @@
 from __future__ import absolute_import
+import pytest
 from dune.testtools.parser import parse_ini_file
 from dune.testtools.escapes import count_unescaped
 
@@ -30,3 +31,112 @@ def test_parse3(dir):
     assert(count_unescaped(parsed['a'], '|') == 0)
     assert(count_unescaped(parsed['c'], ',') == 3)
     assert(count_unescaped(parsed['d'], '"') == 2)
+
+
+def test_parse_modes(dir):
+    # The fast path has to yield exactly what the grammar yields
+    for f in ["parse1.ini", "parse2.ini", "parse3.ini", "import.ini", "metaini2.mini", "cond2.mini", "static1.mini"]:
+        parsed, cmds = parse_ini_file(dir + f, returnCommands=True, fastpath=False)
+        parsed_fast, cmds_fast = parse_ini_file(dir + f, returnCommands=True)
+        assert(parsed.items() == parsed_fast.items())
+        assert(cmds == cmds_fast)
+
+
+def test_fastpath_lines():
+    from dune.testtools.parser import MetaIniParser
+    parser = MetaIniParser()
+    assert(parser.match_fast("a.b = x y # comment\n")[1] == ("a.b", "x y "))
+    assert(parser.match_fast(" [ group.sub ] # comment")[1] == ("group.sub",))
+    assert(parser.match_fast("   # only a comment") == (None, ()))
+    # Lines with quotes, commands, includes or tabs need the full grammar
+    for line in ['a = "x"', "a = 1, 2 | expand", "include other.mini", "a =\tx", "a = "]:
+        assert(parser.match_fast(line) is None)
+
+
+def test_parse_cache(tmpdir):
+    cache = str(tmpdir.join("cache"))
+    main = tmpdir.join("main.mini")
+    inc = tmpdir.join("inc.mini")
+    main.write("include inc.mini\nb = 1, 2 | expand\n")
+    inc.write("a = 1\n")
+    parsed, cmds = parse_ini_file(str(main), returnCommands=True, cache_dir=cache)
+    assert(len(tmpdir.join("cache").listdir()) == 1)
+    # A cache hit yields the same result
+    cached, cached_cmds = parse_ini_file(str(main), returnCommands=True, cache_dir=cache)
+    assert(cached.items() == parsed.items())
+    assert(cached_cmds == cmds)
+    # Changing an included file invalidates the entry
+    inc.write("a = 2\n")
+    assert(parse_ini_file(str(main), cache_dir=cache)['a'] == '2')
+
+
+def test_include_graph(tmpdir):
+    from dune.testtools.parser import include_graph
+    tmpdir.join("common.mini").write("a = 1\n[sec]\nb = 1, 2 | expand\n")
+    tmpdir.join("mid.mini").write("include common.mini\nc = 3\n")
+    tmpdir.join("main.mini").write("include mid.mini\ninclude common.mini\nd = {a}\n")
+    main = str(tmpdir.join("main.mini"))
+    graph = include_graph(main)
+    assert(graph[main] == [str(tmpdir.join("mid.mini")), str(tmpdir.join("common.mini"))])
+    assert(graph[str(tmpdir.join("mid.mini"))] == [str(tmpdir.join("common.mini"))])
+    assert(graph[str(tmpdir.join("common.mini"))] == [])
+    # A memoized include yields the same result as a freshly parsed one
+    parsed, cmds = parse_ini_file(main, returnCommands=True)
+    assert(parsed['a'] == '1' and parsed['sec.b'] == '1, 2' and parsed['c'] == '3')
+    assert(len([c for cl in cmds.values() for c in cl]) == 2)
+
+
+def test_include_graph_reuse(tmpdir, monkeypatch):
+    import os
+    import dune.testtools.parser
+    from dune.testtools.parser import include_graph
+    tmpdir.join("common.mini").write("a = 1\n")
+    tmpdir.join("main.mini").write("include common.mini\nb = 2\n")
+    main = str(tmpdir.join("main.mini"))
+    parse_ini_file(main)
+    parse = dune.testtools.parser._parse
+    calls = []
+
+    def counting_parse(*args):
+        calls.append(args)
+        return parse(*args)
+    monkeypatch.setattr(dune.testtools.parser, "_parse", counting_parse)
+    # The include graph of the last parse is reused
+    assert(include_graph(main)[main] == [str(tmpdir.join("common.mini"))])
+    assert(calls == [])
+    # ...unless an involved file changed
+    tmpdir.join("common.mini").write("a = 1\nc = 3\n")
+    os.utime(str(tmpdir.join("common.mini")), (0, 0))
+    include_graph(main)
+    assert(len(calls) == 1)
+
+
+def test_include_memo_size(tmpdir, monkeypatch):
+    from collections import OrderedDict
+    import os
+    import dune.testtools.parser
+    monkeypatch.setattr(dune.testtools.parser, "_include_memo", OrderedDict())
+    monkeypatch.setattr(dune.testtools.parser, "_INCLUDE_MEMO_SIZE", 2)
+    for name in "abc":
+        tmpdir.join(name + ".mini").write("{} = 1\n".format(name))
+    tmpdir.join("main.mini").write("include a.mini\ninclude b.mini\ninclude a.mini\ninclude c.mini\n")
+    assert(parse_ini_file(str(tmpdir.join("main.mini"))).keys() == ["a", "b", "c"])
+    # The least recently used include is dropped
+    memo = dune.testtools.parser._include_memo
+    assert([os.path.basename(key[0]) for key in memo] == ["a.mini", "c.mini"])
+
+
+def test_include_cycle(tmpdir):
+    tmpdir.join("a.mini").write("include b.mini\n")
+    tmpdir.join("b.mini").write("include a.mini\n")
+    with pytest.raises(ValueError):
+        parse_ini_file(str(tmpdir.join("a.mini")))
+
+
+def test_grammar_sharing(dir):
+    from dune.testtools.parser import MetaIniParser
+    # Parsers of the same dialect share the compiled grammar, other dialects get their own
+    assert(MetaIniParser()._grammar is MetaIniParser(path="foo")._grammar)
+    assert(MetaIniParser(commentChar="%")._grammar is not MetaIniParser()._grammar)
+    # Parsing with a shared grammar does not leak state between files
+    assert(parse_ini_file(dir + "parse1.ini").items() == parse_ini_file(dir + "parse1.ini").items())
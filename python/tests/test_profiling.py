@@ -0,0 +1,26 @@
+from __future__ import absolute_import
+from dune.testtools.metaini import expand_meta_ini
+from dune.testtools.profiling import Profile, active_profile
+import json
+
+
+def test_profile(dir, tmpdir):
+    profile = Profile()
+    configs = expand_meta_ini(dir + "cond1.mini", profile=profile)
+    assert(active_profile() is None)
+    for phase in ("parse", "expansion", "resolution", "filtering", "deduplication", "unique"):
+        assert(profile.records["phases"][phase][0] >= 1)
+    assert(profile.records["commands"]["unique"][0] == 1)
+    assert(profile.records["hooks"]["POST_FILTERING"][0] == 1)
+    assert("__name" in profile.records["keys"])
+
+    # Profiles are accumulated while active
+    with profile:
+        assert(repr(expand_meta_ini(dir + "cond1.mini")) == repr(configs))
+    assert(profile.records["commands"]["unique"][0] == 2)
+
+    filename = str(tmpdir.join("profile.json"))
+    profile.write_json(filename)
+    with open(filename) as f:
+        assert(json.load(f)["commands"]["unique"]["calls"] == 2)
+    assert("unique" in profile.report())
@@ -0,0 +1,78 @@
+from __future__ import absolute_import
+from dune.testtools.server import serve, shutdown, run_script, SERVER_VARIABLE
+import os
+import pytest
+import socket
+import stat
+import threading
+import time
+
+
+def test_server(dir, tmpdir, monkeypatch, capsys):
+    path = str(tmpdir.join("socket"))
+    monkeypatch.setenv(SERVER_VARIABLE, path)
+    # Without a server, the scripts do their work in-process
+    assert(run_script("dune_has_static_section.py", ["--ini", dir + "static1.mini"]) == 1)
+    inprocess = tmpdir.join("inprocess.log")
+    assert(run_script("dune_extract_static.py", ["--ini", dir + "static1.mini", "--file", str(inprocess)]) == 0)
+
+    # A socket left behind by a crashed server is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    server = threading.Thread(target=serve, args=(path,))
+    server.start()
+    try:
+        while not listening(path):
+            time.sleep(0.01)
+        # The socket is accessible to its owner only
+        assert(stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0)
+        # A running server is not replaced
+        with pytest.raises(ValueError):
+            serve(path)
+        # Relative paths refer to the working directory of the client
+        monkeypatch.chdir(dir)
+        assert(run_script("dune_has_static_section.py", ["--ini", "static1.mini"]) == 1)
+        assert(run_script("dune_extract_static.py", ["--ini", "static1.mini"]) == 0)
+        assert(capsys.readouterr().out == inprocess.read())
+        # Errors are reported to the client
+        assert(run_script("dune_expand_metaini.py", ["--ini", "missing.mini"]) == 1)
+        assert("No such file" in capsys.readouterr().err)
+    finally:
+        assert(shutdown(path))
+        server.join()
+    assert(not tmpdir.join("socket").exists() and not shutdown(path))
+
+
+def listening(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def test_serve_no_socket(tmpdir):
+    # Files other than sockets are never removed
+    tmpdir.join("socket").write("data")
+    with pytest.raises(ValueError):
+        serve(str(tmpdir.join("socket")))
+    assert(tmpdir.join("socket").read() == "data")
+
+
+def test_run_exit_status(monkeypatch, capsys):
+    import sys
+    import dune.testtools.batch
+    from dune.testtools.server import _run
+
+    def script(code):
+        return (lambda: dune.testtools.batch.has_static_section_parser(), lambda args: sys.exit(code))
+    # The exit status follows the conventions of the interpreter
+    for code, status in ((None, 0), (0, 0), (3, 3), ("message", 1)):
+        monkeypatch.setitem(dune.testtools.batch._scripts, "exit.py", script(code))
+        assert(_run("exit.py", ["--ini", "x.mini"]) == status)
+    # A message is printed
+    assert(capsys.readouterr().err == "message\n")
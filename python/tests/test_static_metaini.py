@@ -14,3 +14,21 @@ def test_static1(dir):
     static_check = {'G1_0000': {'COMPILE_DEFINITIONS': {'GRID': 'G1', 'SOLVER': 'Solver1a'}}, 'G1_0001': {'COMPILE_DEFINITIONS': {'GRID': 'G1', 'SOLVER': 'Solver1b'}}, 'G2_0001': {'COMPILE_DEFINITIONS': {'GRID': 'G2', 'SOLVER': 'Solver1a'}}, 'G2_0000': {'COMPILE_DEFINITIONS': {'GRID': 'G2', 'SOLVER': 'Solver1b'}}, 'G3': {'COMPILE_DEFINITIONS': {'GRID': 'G3', 'SOLVER': 'Solver2'}}, '__CONFIGS': ['G1_0000', 'G2_0000', 'G2_0001', 'G1_0001', 'G3'], '__STATIC_DATA': ['GRID', 'SOLVER']}
     unmatched_item = set(static) ^ set(static_check)
     assert(len(unmatched_item) == 0)
+
+
+def test_static_only_expansion(tmpdir):
+    from dune.testtools.metaini import _prepare
+    ini = tmpdir.join("static.mini")
+    ini.write("x = 1, 2, 3 | expand\ny = a, b | expand\nz = {y}\nw = {x}_{z} | eval\n__exec_suffix = {__static.A}_{z}\n[__static]\nA = 1, 2 | expand\n")
+    # Only the keys the static information depends on are expanded
+    configurations, cmds, groups, resolvable = _prepare(str(ini), "=", "#", None, (("__static", "__exec_suffix"), None))
+    assert(sorted(groups) == [["__static.A"], ["y"]])
+    # x is only needed by w, whose value cannot change the static information
+    assert(sorted(configurations[0].keys()) == ["__exec_suffix", "__static.A", "y", "z"])
+    static = extract_static_info(str(ini))
+    assert(sorted(static["__CONFIGS"]) == ["1_a", "1_b", "2_a", "2_b"])
+
+    # The keys referenced by the other keys of a kept group are needed as well
+    ini.write("a = 1, 2 | expand g\nb = {c}, y | expand g\nc = lit\n[__static]\nS = {a}\n")
+    static = extract_static_info(str(ini))
+    assert(len(static["__CONFIGS"]) == 2)
@@ -33,3 +33,13 @@ def test_total_order_on_configs(dir):
     configs = expand_meta_ini(dir + "metaini1.mini", addNameKey=True)
     for i in range(len(configs) - 1):
         assert(configs[i] < configs[i + 1])
+
+
+def test_unique_values_colliding_with_counters():
+    from dune.testtools.command import apply_commands
+    from dune.testtools.parser import CommandToApply
+    from dune.testtools.parametertree.dotdict import DotDict
+    configs = [DotDict({"n": v}) for v in ["a", "a", "a_0000"]]
+    apply_commands(configs, [CommandToApply(name="unique", args=[], key="n")])
+    assert(check_uniqueness(configs, "n"))
+    assert([c["n"] for c in configs] == ["a_0000_0000", "a_0001", "a_0000_0001"])